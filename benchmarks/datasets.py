@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+import random
+from src.checkpoint import atomic_output
+
+# Named dump sizes for the data_processor scaling runs.
+LINKEDIN_SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+INDUSTRIES = [
+    "Information Technology & Services", "Computer Software", "Internet", "Financial Services",
+    "Marketing & Advertising", "Hospital & Health Care", "Retail", "Real Estate", "Construction",
+    "Education Management", "Telecommunications", "Logistics & Supply Chain", "Automotive",
+    "Management Consulting", "Staffing & Recruiting", "Food & Beverages",
+]
+COUNTRIES = ["IN", "US", "GB", "DE", "SG", "AE", "CA", "AU", "FR", "NL"]
+COMPANY_SIZES = ["1-10", "11-50", "51-200", "201-500", "501-1000", "1001-5000", "5001-10000", "10001+"]
+
+
+def linkedin_dump_path(directory, rows, seed=0, compress=False):
+    return os.path.join(directory, f"linkedin_{rows}_seed{seed}.ndjson" + (".gz" if compress else ""))
+
+
+def generate_linkedin_dump(path, rows, seed=0, overlap=100000):
+    """
+    Writes a synthetic LinkedIn company dump as NDJSON, gzip-compressed if the path ends in .gz.
+
+    Records are written one at a time, so dumps far larger than memory can be generated.
+    The first `overlap` companies use the same websites as the mock Places server
+    ("companyN.example.com"), so the merge step has real duplicates to resolve.
+
+    Args:
+        path (str): Where to write the dump.
+        rows (int): Number of companies.
+        seed (int): Seed for the generated values; the same seed gives the same file.
+        overlap (int): Number of companies shared with the mock Places data.
+
+    Returns:
+        str: The path of the dump.
+    """
+    rng = random.Random(seed)
+    opener = gzip.open if path.endswith(".gz") else open
+    with atomic_output(path) as tmp_path:
+        with opener(tmp_path, 'wt', encoding='utf-8') as f:
+            for number in range(rows):
+                size = rng.choice(COMPANY_SIZES)
+                low = int(size.split("-")[0].rstrip("+"))
+                countries = [rng.choice(COUNTRIES)]
+                if rng.random() < 0.1:
+                    countries.append(rng.choice(COUNTRIES))
+                domain = f"company{number}.example.com" if number < overlap else f"linkedin{number}.example.org"
+                record = {
+                    "name": f"Company {number}",
+                    "website": f"https://{domain}",
+                    "industries": rng.choice(INDUSTRIES),
+                    "country_codes_array": countries,
+                    "company_size": f"{size} employees",
+                    "employees_in_linkedin": rng.randint(low, low * 2 + 10),
+                    "phone": f"+1 555 {number:07d}" if rng.random() < 0.5 else None,
+                    "url": f"https://www.linkedin.com/company/company-{number}",
+                }
+                f.write(json.dumps(record) + "\n")
+    return path
+
+
+def ensure_linkedin_dump(directory, rows, seed=0, compress=False):
+    """Returns the path of a dump with `rows` companies in `directory`, generating it only if it's missing."""
+    os.makedirs(directory, exist_ok=True)
+    path = linkedin_dump_path(directory, rows, seed, compress)
+    if not os.path.exists(path):
+        print(f"🧪 Generating a synthetic LinkedIn dump with {rows} companies at '{path}'...")
+        generate_linkedin_dump(path, rows, seed=seed)
+    return path
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAGE_SIZE = 20  # Google returns up to 20 Text Search results per page
+VERIFICATION_RESULTS = ["valid"] * 7 + ["invalid", "catchall", "unknown"]
+
+
+def _stable_int(value):
+    """A hash of a string that is the same in every process, unlike hash()."""
+    return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:12], 16)
+
+
+class MockAPIServer:
+    """
+    A local stand-in for the Google Places, Apollo and NeverBounce APIs.
+
+    All three APIs are served from one threaded HTTP server, under /places, /apollo
+    and /neverbounce, with the same paths and response shapes the clients in src/ use.
+    Responses are generated from the request itself, so the same run always sees the
+    same data.
+
+    Args:
+        latency (float): Mean seconds each response is delayed by (jittered +/-50%).
+        error_rate (float): Fraction of requests answered with a 503.
+        places_per_term (int): Text Search results per search term, 20 per page.
+        place_pool (int): Number of distinct places the terms draw from; smaller pools
+            mean more places are found by several terms.
+        people_per_company (int): People Apollo knows about at each company.
+        people_per_page (int): People returned per Apollo search page when the request sets no per_page.
+        page_token_delay (float): Seconds before a next_page_token becomes valid.
+        job_delay (float): Seconds before a NeverBounce bulk job is reported complete.
+        seed (int): Seed for the latency jitter and injected errors.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, places_per_term=60, place_pool=100000,
+                 people_per_company=25, people_per_page=25, page_token_delay=0.0, job_delay=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.places_per_term = places_per_term
+        self.place_pool = place_pool
+        self.people_per_company = people_per_company
+        self.people_per_page = people_per_page
+        self.page_token_delay = page_token_delay
+        self.job_delay = job_delay
+        self.requests = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = {}  # page token -> time it was issued
+        self._jobs = {}  # job id -> (emails, time it was created)
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Starts serving on a free local port in a background thread."""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, Nagle's algorithm
+            # and delayed ACKs add ~40ms to every keep-alive response.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                mock._handle(self, None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                mock._handle(self, body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    # --- Request handling ---
+    def _handle(self, handler, body):
+        parsed = urlparse(handler.path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        path = parsed.path
+
+        routes = [
+            ("/places/textsearch/json", self._text_search),
+            ("/places/details/json", self._place_details),
+            ("/apollo/api/v1/organizations/enrich", self._apollo_enrich),
+            ("/apollo/api/v1/organizations/bulk_enrich", self._apollo_bulk_enrich),
+            ("/apollo/v1/mixed_people/search", self._apollo_people_search),
+            ("/neverbounce/single/check", self._neverbounce_single_check),
+            ("/neverbounce/jobs/create", self._neverbounce_jobs_create),
+            ("/neverbounce/jobs/status", self._neverbounce_jobs_status),
+            ("/neverbounce/jobs/results", self._neverbounce_jobs_results),
+        ]
+        route = next((handle for prefix, handle in routes if path == prefix), None)
+
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            delay = self.latency * self._random.uniform(0.5, 1.5) if self.latency else 0
+            fail = self.error_rate and self._random.random() < self.error_rate
+
+        if delay:
+            time.sleep(delay)
+        if route is None:
+            self._respond(handler, 404, {"error": f"Unknown path {path}"})
+        elif fail:
+            self._respond(handler, 503, {"error": "Injected failure"})
+        else:
+            self._respond(handler, 200, route(params, body or {}))
+
+    def _respond(self, handler, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    # --- Google Places ---
+    def place_number(self, query, position):
+        """The place found at a position in a term's results; the same place can appear under many terms."""
+        return _stable_int(f"{query}|{position}") % self.place_pool
+
+    def _text_search(self, params, body):
+        query = params.get("query", "")
+        token = params.get("pagetoken")
+        page = 0
+        if token:
+            with self._lock:
+                issued = self._tokens.get(token)
+            if issued is None or time.monotonic() - issued < self.page_token_delay:
+                return {"status": "INVALID_REQUEST", "results": []}
+            page = int(token.rsplit("|", 1)[1])
+
+        start = page * PAGE_SIZE
+        end = min(start + PAGE_SIZE, self.places_per_term)
+        results = []
+        for position in range(start, end):
+            number = self.place_number(query, position)
+            results.append({
+                "name": f"Company {number}",
+                "formatted_address": f"{number} Benchmark Street",
+                "place_id": f"place_{number}",
+            })
+
+        data = {"status": "OK" if results else "ZERO_RESULTS", "results": results}
+        if end < self.places_per_term:
+            next_token = f"{query}|{page + 1}"
+            with self._lock:
+                self._tokens[next_token] = time.monotonic()
+            data["next_page_token"] = next_token
+        return data
+
+    def _place_details(self, params, body):
+        number = int(params.get("place_id", "place_0").split("_", 1)[1])
+        return {
+            "status": "OK",
+            "result": {
+                "name": f"Company {number}",
+                "website": f"https://company{number}.example.com",
+                "formatted_phone_number": f"+1 555 {number:07d}",
+                "rating": round(3 + (number % 20) / 10, 1),
+            },
+        }
+
+    # --- Apollo ---
+    def _apollo_enrich(self, params, body):
+        domain = params.get("domain", "")
+        return {"organization": {"id": f"org_{domain}", "primary_domain": domain}}
+
+    def _apollo_bulk_enrich(self, params, body):
+        # Like the real API, some organizations come back under another primary domain
+        # (a regional site here), so clients can't always match them to the domain they sent.
+        return {"organizations": [
+            {"id": f"org_{domain}", "primary_domain": f"uk.{domain}" if _stable_int(domain) % 5 == 0 else domain}
+            for domain in body.get("domains", [])
+        ]}
+
+    def _apollo_people_search(self, params, body):
+        org_id = (body.get("q_organization_ids") or [""])[0]
+        domain = org_id[len("org_"):]
+        page = int(body.get("page", 1))
+        per_page = int(body.get("per_page") or self.people_per_page)
+        people = [
+            {
+                "id": f"{org_id}_person_{i}",
+                "name": f"Person {i}",
+                "title": "Head of Engineering" if i % 5 == 0 else "Software Engineer",
+                "seniority": "head" if i % 5 == 0 else "senior",
+                "email": f"person{i}@{domain}",
+                "organization_id": org_id,
+            }
+            for i in range(self.people_per_company)
+        ]
+        # Apollo matches titles loosely; a substring match in either direction is close enough here.
+        titles = [title.lower() for title in body.get("person_titles") or []]
+        if titles:
+            people = [p for p in people if any(t in p["title"].lower() or p["title"].lower() in t for t in titles)]
+        seniorities = body.get("person_seniorities")
+        if seniorities:
+            people = [p for p in people if p["seniority"] in seniorities]
+        start = (page - 1) * per_page
+        return {
+            "people": people[start:start + per_page],
+            "pagination": {"page": page, "per_page": per_page, "total_entries": len(people)},
+        }
+
+    # --- NeverBounce ---
+    def verification_result(self, email):
+        return VERIFICATION_RESULTS[_stable_int(email) % len(VERIFICATION_RESULTS)]
+
+    def _neverbounce_single_check(self, params, body):
+        return {"status": "success", "result": self.verification_result(params.get("email", ""))}
+
+    def _neverbounce_jobs_create(self, params, body):
+        emails = [item["email"] for item in body.get("input", [])]
+        with self._lock:
+            job_id = len(self._jobs) + 1
+            self._jobs[job_id] = (emails, time.monotonic())
+        return {"status": "success", "job_id": job_id}
+
+    def _neverbounce_jobs_status(self, params, body):
+        with self._lock:
+            emails, created = self._jobs[int(params["job_id"])]
+        done = time.monotonic() - created >= self.job_delay
+        return {"status": "success", "job_status": "complete" if done else "running", "total": {"records": len(emails)}}
+
+    def _neverbounce_jobs_results(self, params, body):
+        with self._lock:
+            emails, _ = self._jobs[int(params["job_id"])]
+        page = int(params.get("page", 1))
+        per_page = int(params.get("items_per_page", 1000))
+        chunk = emails[(page - 1) * per_page:page * per_page]
+        return {
+            "status": "success",
+            "total_pages": max(1, -(-len(emails) // per_page)),
+            "results": [
+                {"data": {"email": email}, "verification": {"result": self.verification_result(email)}}
+                for email in chunk
+            ],
+        }
@@ -0,0 +1,229 @@
+"""
+Offline benchmarks for the lead generation pipeline.
+
+Starts the mock Google Places, Apollo and NeverBounce servers, points the API clients
+at them, and drives the pipeline's stages end to end, reporting throughput and memory.
+Nothing here talks to the paid APIs.
+
+Usage (from the repository root):
+    python -m benchmarks.run
+    python -m benchmarks.run --stages data --linkedin-size 1m
+    python -m benchmarks.run --latency 0.05 --error-rate 0.02 --terms 50
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from src import config, metrics
+from .datasets import LINKEDIN_SIZES, ensure_linkedin_dump
+from .mock_servers import MockAPIServer
+
+STAGES = ["places", "data", "contacts"]
+
+
+def peak_rss_mb():
+    """The process's peak resident memory so far, in MB, or None where it can't be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def configure(server, args, workdir):
+    """Points the API clients at the mock server and keeps every artefact inside `workdir`."""
+    config.GOOGLE_PLACES_BASE_URL = f"{server.url}/places"
+    config.APOLLO_BASE_URL = f"{server.url}/apollo"
+    config.NEVERBOUNCE_BASE_URL = f"{server.url}/neverbounce"
+    config.GOOGLE_PLACES_API_KEY = config.APOLLO_API_KEY = config.NEVERBOUNCE_API_KEY = "benchmark"
+
+    # Every run starts cold, so cached responses and checkpoints can't flatter the numbers.
+    config.CACHE_ENABLED = False
+    config.ENRICHMENT_LEDGER_ENABLED = False
+    # The mock people's titles don't match the real personas, and every one should be verified.
+    config.CONTACT_PERSONAS = []
+    config.CONTACT_SENIORITIES = []
+    config.RESUME_FROM_CHECKPOINT = False
+    config.LINKEDIN_INDEX_ENABLED = not args.scan
+    config.HTTP_BACKOFF_BASE = 0.05
+    config.NEVERBOUNCE_POLL_INTERVAL = 0.05
+    config.VERIFICATION_BATCH_WAIT = 1
+    if not args.rate_limits:
+        config.RATE_LIMITS = {}
+
+    config.STORAGE_FORMAT = args.storage
+    config.set_output_dir(workdir)
+
+
+def remove_outputs(*paths):
+    """Deletes stage outputs, along with their checkpoints, from an earlier benchmark run."""
+    for path in paths:
+        for candidate in [path] + [path + suffix for suffix in (".terms.checkpoint", ".places.checkpoint", ".domains.checkpoint")]:
+            if os.path.exists(candidate):
+                os.remove(candidate)
+
+
+def run_stage(name, func, args, results):
+    """Runs one benchmark stage, recording its time, records per second and memory."""
+    if args.trace_memory:
+        tracemalloc.start()
+    output = open(os.devnull, 'w') if not args.verbose else None
+    start = time.monotonic()
+    try:
+        with metrics.stage(name) as timer, contextlib.redirect_stdout(output or sys.stdout):
+            timer.records = func() or 0
+    finally:
+        if output:
+            output.close()
+    elapsed = time.monotonic() - start
+
+    result = {
+        "seconds": round(elapsed, 3),
+        "records": timer.records,
+        "records_per_second": round(timer.records / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if args.trace_memory:
+        result["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        tracemalloc.stop()
+    results[name] = result
+    print(f"⏱️  {name}: {timer.records} records in {elapsed:.2f}s "
+          f"({result['records_per_second']} records/s, peak RSS {result['peak_rss_mb']} MB)")
+
+
+def bench_places(args):
+    from src import google_places_wrapper
+    from src.checkpoint import RecordWriter
+
+    search_terms = [f"benchmark companies {i}" for i in range(args.terms)]
+    remove_outputs(config.google_places_data_file)
+    with RecordWriter(config.google_places_data_file, key="place_id") as writer:
+        google_places_wrapper.scrape_google_places_batch(search_terms, on_record=writer.write)
+    return writer.count
+
+
+def bench_data(args, linkedin_file, cold):
+    from src import data_processor
+    from src.company_index import CompanyIndex
+
+    if cold:
+        shutil.rmtree(CompanyIndex.index_dir(linkedin_file), ignore_errors=True)
+    remove_outputs(config.merged_data_file)
+    return data_processor.run_data_pipeline(
+        linkedin_file,
+        config.google_places_data_file,
+        args.industry,
+        args.country,
+        config.merged_data_file
+    )
+
+
+def bench_contacts(args):
+    from src import contact_finder
+
+    remove_outputs(config.verified_employees_file)
+    return contact_finder.find_and_verify_contacts(config.merged_data_file, config.verified_employees_file)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against local mock APIs.")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"Comma-separated stages to run, in order: {', '.join(STAGES)}.")
+    parser.add_argument("--workdir", help="Directory for datasets and outputs. Defaults to a temporary directory.")
+    parser.add_argument("--report", help="Where to write the JSON report. Defaults to <workdir>/benchmark_report.json.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the mock data, latency jitter and errors.")
+    parser.add_argument("--storage", choices=["ndjson", "sqlite"], default="ndjson",
+                        help="Format of the stage outputs.")
+
+    mock = parser.add_argument_group("mock servers")
+    mock.add_argument("--latency", type=float, default=0.0, help="Mean response latency in seconds.")
+    mock.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503.")
+    mock.add_argument("--terms", type=int, default=20, help="Number of Google Places search terms.")
+    mock.add_argument("--places-per-term", type=int, default=60, help="Text Search results per term (20 per page).")
+    mock.add_argument("--place-pool", type=int, default=5000,
+                      help="Distinct places the terms draw from; smaller pools give more overlap between terms.")
+    mock.add_argument("--people-per-company", type=int, default=25, help="People Apollo returns per company.")
+    mock.add_argument("--page-token-delay", type=float, default=0.0,
+                      help="Seconds before a Text Search next_page_token becomes valid (Google's is about 2).")
+    mock.add_argument("--rate-limits", action="store_true",
+                      help="Keep the client-side rate limits from src/config.py (off by default).")
+
+    data = parser.add_argument_group("data processor")
+    data.add_argument("--linkedin-size", default="10k",
+                      help=f"Rows in the synthetic LinkedIn dump: {', '.join(LINKEDIN_SIZES)} or a number.")
+    data.add_argument("--industry", default="Information Technology & Services", help="Industry filter.")
+    data.add_argument("--country", default="IN", help="Country filter.")
+    data.add_argument("--scan", action="store_true", help="Filter the dump with a full scan instead of the index.")
+
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also report each stage's peak Python allocations (slower).")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own progress output.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        sys.exit(f"Unknown stages: {', '.join(unknown)}")
+    rows = LINKEDIN_SIZES.get(args.linkedin_size.lower()) or int(args.linkedin_size)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="people_data_gen_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    report_file = args.report or os.path.join(workdir, "benchmark_report.json")
+
+    server = MockAPIServer(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        places_per_term=args.places_per_term,
+        place_pool=args.place_pool,
+        people_per_company=args.people_per_company,
+        page_token_delay=args.page_token_delay,
+        seed=args.seed,
+    )
+    print(f"--- Benchmarking {', '.join(stages)} in '{workdir}' ---")
+    results = {}
+    with server:
+        configure(server, args, workdir)
+        metrics.reset()
+
+        if "places" in stages:
+            run_stage("places", lambda: bench_places(args), args, results)
+        if "data" in stages:
+            linkedin_file = ensure_linkedin_dump(workdir, rows, seed=args.seed)
+            run_stage("data_cold", lambda: bench_data(args, linkedin_file, cold=True), args, results)
+            if not args.scan:
+                # The second run reuses the index built by the first.
+                run_stage("data_warm", lambda: bench_data(args, linkedin_file, cold=False), args, results)
+        if "contacts" in stages:
+            run_stage("contacts", lambda: bench_contacts(args), args, results)
+
+        mock_requests = dict(server.requests)
+
+    report = {
+        "settings": {key: value for key, value in vars(args).items() if key not in ("workdir", "report")},
+        "linkedin_rows": rows if "data" in stages else None,
+        "stages": results,
+        "mock_requests": mock_requests,
+        "metrics": metrics.report(),
+    }
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4)
+    print(f"\n📊 Benchmark report written to '{report_file}'.")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,35 @@
+"""
+Runs the lead generation pipeline.
+
+Usage:
+    python main.py
+    python main.py --stages process_and_merge_data --industry "Computer Software" --country IN --country US
+    python main.py --stages all --output-dir runs/esg --fresh
+    python main.py --stages all --workers 4
+
+Each stage's modules are imported only when the stage actually runs, so a
+processing-only run doesn't load the LLM or HTTP client libraries.
+"""
+import argparse
 import json
 import os
-from src import google_places_wrapper
-from src import gen_search_terms, data_processor, contact_finder, email_verifier
-from src.config import PRODUCT_DESCRIPTION, lead_plan_file, linkedin_data_file, google_places_data_file, merged_data_file, verified_employees_file, industry_filter, country_filter
+import sys
+from functools import partial
+from src import config, metrics
+from src.pipeline import Pipeline, Stage
+
+# Exit status of a run whose stages all finished, but left work for the next run to retry.
+EXIT_INCOMPLETE = 3
+
+STAGE_NAMES = ["generate_search_terms", "scrape_google_places", "process_and_merge_data", "score_companies",
+               "find_and_verify_contacts"]
+
+# Stages that can be split across worker processes: the option holding the stage's output,
+# the flag that sets it, and the field identifying a record when the shards are merged.
+SHARDED_STAGES = {
+    "scrape_google_places": ("places_file", "--places-file", "place_id"),
+    "find_and_verify_contacts": ("verified_file", "--verified-file", "email"),
+}
 
 def save_data(data, filename):
     """Saves data to a JSON file."""
@@ -13,63 +40,342 @@ def save_data(data, filename):
     else:
         print(f"\nNo data to save to '{filename}'.")
 
-if __name__ == "__main__":
-    print("--- Starting Lead Generation Pipeline ---")
+def run_shards(ctx, stage, opts):
+    """
+    Runs a stage as opts.workers worker processes and merges their outputs into the stage's output file.
 
-    # This dictionary makes the pipeline flexible.
-    # Set any step to False to skip it.
-    pipeline_config = {
-        "generate_search_terms": True,
-        "scrape_google_places": True,
-        "process_and_merge_data": False,
-        "find_and_verify_contacts": False,
-    }
-
-    # --- Step 1: Generate Search Terms from Product Description ---
-    search_terms = []
-    if pipeline_config["generate_search_terms"]:
-        print("\n--- Step 1: Generating Google Places search terms ---")
-        lead_plan = gen_search_terms.generate_lead_generation_plan(PRODUCT_DESCRIPTION)
-        # Save the lead_plan to a JSON file
-        save_data(lead_plan, lead_plan_file)
-        if not lead_plan:
-            print("❌ Failed to generate a lead plan. Exiting.")
-            exit()
-        for group in lead_plan:
-            search_terms.extend(group.get("google_search_terms", []))
-    
-    # --- Step 2: Scrape Google Places using the generated terms ---
-    if pipeline_config["scrape_google_places"]:
-        if not search_terms:
-            print("❌ No search terms available. Skipping Google Places scraping.")
-        else:
-            print("\n--- Step 2: Scraping Google Places for company data ---")
-            google_places_data = []
-            for term in search_terms:
-                companies = google_places_wrapper.scrape_google_places(term)
-                google_places_data.extend(companies)
-            
-            save_data(google_places_data, google_places_data_file)
-
-    # --- Step 3: Process, Filter, and Merge Data ---
-    if pipeline_config["process_and_merge_data"]:
-        print("\n--- Step 3: Filtering, merging, and deduplicating data ---")
-        
-        data_processor.run_data_pipeline(
-            linkedin_data_file,
-            google_places_data_file,
-            industry_filter,
-            country_filter,
-            merged_data_file
-        )
+    The workers' API calls, latencies and stage timings are added to this run's report.
+    """
+    from src import sharding
+
+    attr, flag, key = SHARDED_STAGES[stage]
+    output_file = getattr(opts, attr)
+    shared_dir = opts.shared_dir or config.output_dir
+    shard_files = []
+    commands = []
+    for index in range(opts.workers):
+        directory = sharding.shard_dir(config.output_dir, index)
+        shard_file = os.path.join(directory, os.path.basename(output_file))
+        args = ["--stages", stage, "--shard", f"{index}/{opts.workers}", "--output-dir", directory,
+                "--shared-dir", shared_dir, "--storage", config.STORAGE_FORMAT,
+                "--lead-plan-file", opts.lead_plan_file, "--scored-file", opts.scored_file, flag, shard_file]
+        if not config.RESUME_FROM_CHECKPOINT:
+            args.append("--fresh")
+        shard_files.append(shard_file)
+        commands.append(sharding.python_command(os.path.abspath(__file__), args))
+
+    # Each worker writes its own run report, which is added to this run's once it finishes.
+    reports = [os.path.join(sharding.shard_dir(config.output_dir, index), os.path.basename(config.run_report_file))
+               for index in range(opts.workers)]
+    for report in reports:
+        if os.path.exists(report):
+            os.remove(report)
+
+    print(f"🔀 Running '{stage}' on {opts.workers} workers.")
+    exit_codes = sharding.run_workers(commands)
+    for index, report in enumerate(reports):
+        if os.path.exists(report):
+            with open(report, 'r', encoding='utf-8') as f:
+                metrics.merge_report(json.load(f), stage_suffix=f" (shard {index})")
+    failed = [index for index, code in exit_codes.items() if code != EXIT_INCOMPLETE]
+    if failed:
+        raise RuntimeError(f"shards {', '.join(map(str, failed))} of '{stage}' failed")
+    if exit_codes:
+        ctx.incomplete(f"shards {', '.join(map(str, exit_codes))} left work unfinished")
+    count = sharding.reduce_outputs(shard_files, output_file, key)
+    print(f"✅ Merged {count} records from {opts.workers} shards into '{output_file}'.")
+    return count
+
+# --- Step 1: Generate Search Terms from Product Description ---
+def generate_search_terms(ctx, opts):
+    """Asks the LLM for a lead plan, passing each target group downstream as soon as it is written."""
+    from src import gen_search_terms
 
-    # --- Step 4: Find and Verify Contacts ---
-    if pipeline_config["find_and_verify_contacts"]:
-        print("\n--- Step 4: Finding and verifying contacts ---")
-        
-        contact_finder.find_and_verify_contacts(
-            input_file=merged_data_file,
-            output_file=verified_employees_file
+    if config.LLM_PLAN_STREAMING:
+        groups = gen_search_terms.stream_lead_generation_plan(opts.product_description)
+    else:
+        groups = gen_search_terms.generate_lead_generation_plan(opts.product_description)
+    lead_plan = []
+    for group in groups:
+        lead_plan.append(group)
+        ctx.emit(group)
+    if not lead_plan:
+        raise RuntimeError("Failed to generate a lead plan.")
+    # Save the lead_plan to a JSON file
+    save_data(lead_plan, opts.lead_plan_file)
+    return sum(len(group.get("google_search_terms", [])) for group in lead_plan)
+
+# --- Step 2: Scrape Google Places using the generated terms ---
+def scrape_google_places(ctx, opts):
+    """Scrapes each target group's search terms as soon as the group arrives, passing records on as they are fetched."""
+    from src import google_places_wrapper, http_client
+    from src.checkpoint import Checkpoint, RecordWriter, checkpoint_path, clear_stage, read_records, update_records
+
+    places_file = opts.places_file
+    if opts.workers > 1:
+        # The workers read the lead plan from its file, so it has to be complete first.
+        for _ in ctx.stream("generate_search_terms"):
+            pass
+        count = run_shards(ctx, "scrape_google_places", opts)
+        for record in read_records(places_file):
+            ctx.emit(record)
+        return count
+
+    if not config.RESUME_FROM_CHECKPOINT:
+        clear_stage(places_file, "terms", "places")
+    elif os.path.exists(places_file):
+        # The merge stage needs every place, including the ones saved by an earlier run.
+        for record in read_records(places_file):
+            ctx.emit(record)
+
+    # Records are appended as they arrive; the checkpoints let a restarted run
+    # skip the terms and places that were already saved.
+    terms_done = Checkpoint(checkpoint_path(places_file, "terms"))
+    places_done = Checkpoint(checkpoint_path(places_file, "places"))
+    # One pooled session is shared by every search term so connections are reused.
+    session = http_client.get_session()
+    skipped_terms = []
+    attempted_terms = []
+
+    def pending_terms():
+        for group in ctx.stream("generate_search_terms"):
+            for term in group.get("google_search_terms", []):
+                if opts.shard and not opts.shard.owns(term):
+                    continue
+                if term in terms_done:
+                    skipped_terms.append(term)
+                else:
+                    attempted_terms.append(term)
+                    yield term
+
+    # Records are saved as their details arrive, before every term that finds them is known.
+    # Those whose terms grew afterwards are updated in place, which also completes the copies
+    # already passed downstream, and saved again once the writer is closed.
+    updated = []
+    with RecordWriter(places_file, key="place_id") as writer:
+        def save_place(record):
+            writer.write(record)
+            places_done.mark(record["place_id"])
+            ctx.emit(record)
+
+        # Terms are scraped concurrently and each unique place is fetched only once.
+        google_places_wrapper.scrape_google_places_batch(
+            pending_terms(),
+            session=session,
+            skip_place_ids=places_done,
+            on_record=save_place,
+            on_term_done=terms_done.mark,
+            stream=True,
+            on_update=updated.append
         )
-    
+    update_records(places_file, updated, key="place_id")
+
+    # Terms whose search failed, or with a place whose details failed, are searched again next run.
+    failed_terms = [term for term in attempted_terms if term not in terms_done]
+    if failed_terms:
+        ctx.incomplete(f"{len(failed_terms)} search terms")
+    if skipped_terms:
+        print(f"⏭️  Skipped {len(skipped_terms)} search terms that were already scraped.")
+    print(f"\n✅ Saved {writer.count} new records to '{places_file}' ({len(places_done)} places in total).")
+    terms_done.close()
+    places_done.close()
+    return writer.count
+
+# --- Step 3: Process, Filter, and Merge Data ---
+def process_and_merge_data(ctx, opts):
+    """Filters the LinkedIn data while scraping is still running, then merges in the scraped places."""
+    from src import data_processor
+
+    return data_processor.run_data_pipeline(
+        opts.linkedin_file,
+        opts.places_file,
+        opts.industry,
+        opts.country,
+        opts.merged_file,
+        size_ranges=opts.size,
+        places_data=ctx.stream("scrape_google_places")
+    )
+
+# --- Step 4: Score and Rank Companies ---
+def score_companies(ctx, opts):
+    """Keeps the merged companies scoring at least LEAD_SCORE_THRESHOLD, best first."""
+    from src import lead_scoring
+
+    target_range = opts.size[0] if opts.size and len(opts.size) == 1 else None
+    return lead_scoring.run_scoring(opts.merged_file, opts.scored_file, opts.industry, target_range=target_range)
+
+# --- Step 5: Find and Verify Contacts ---
+def find_and_verify_contacts(ctx, opts):
+    from src import contact_finder
+
+    if opts.workers > 1:
+        return run_shards(ctx, "find_and_verify_contacts", opts)
+    unfinished = set()
+    count = contact_finder.find_and_verify_contacts(
+        input_file=opts.scored_file,
+        output_file=opts.verified_file,
+        shard=opts.shard,
+        unfinished=unfinished
+    )
+    if unfinished:
+        ctx.incomplete(f"{len(unfinished)} companies")
+    return count
+
+def build_pipeline(opts):
+    """The pipeline's stages, with the files each one reads and writes."""
+    shard_params = {"shard": str(opts.shard)} if opts.shard else None
+    return [
+        Stage("generate_search_terms", partial(generate_search_terms, opts=opts),
+              outputs=[opts.lead_plan_file],
+              params={"product_description": opts.product_description}),
+        Stage("scrape_google_places", partial(scrape_google_places, opts=opts),
+              streams=["generate_search_terms"],
+              outputs=[opts.places_file],
+              params=shard_params),
+        Stage("process_and_merge_data", partial(process_and_merge_data, opts=opts),
+              inputs=[opts.linkedin_file],
+              streams=["scrape_google_places"],
+              outputs=[opts.merged_file],
+              params={"industry": opts.industry, "country": opts.country, "size": opts.size}),
+        Stage("score_companies", partial(score_companies, opts=opts),
+              inputs=[opts.merged_file],
+              after=["process_and_merge_data"],
+              outputs=[opts.scored_file],
+              params={"industry": opts.industry, "size": opts.size, "threshold": config.LEAD_SCORE_THRESHOLD,
+                      "weights": config.SCORING_WEIGHTS, "range": config.SCORING_EMPLOYEE_RANGE,
+                      "keep_unscored": config.SCORING_KEEP_UNSCORED}),
+        Stage("find_and_verify_contacts", partial(find_and_verify_contacts, opts=opts),
+              after=["score_companies"],
+              outputs=[opts.verified_file],
+              params=shard_params,
+              # With the ledger, a rerun on the same companies still re-checks stale entries.
+              skip_unchanged=not config.ENRICHMENT_LEDGER_ENABLED),
+    ]
+
+def parse_size_range(value):
+    """Parses an employee-count range like "50-750", "1000-" or "-50" into a (min, max) tuple."""
+    low, sep, high = value.partition("-")
+    try:
+        if not sep:
+            raise ValueError
+        return (int(low) if low.strip() else None, int(high) if high.strip() else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a range like 50-750, got '{value}'")
+
+def parse_shard(value):
+    """Parses a shard like "2/8" (worker 2 of 8, counting from 0)."""
+    from src.sharding import Shard
+
+    try:
+        return Shard.parse(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def as_list(value):
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and verify B2B leads from a product description.")
+    parser.add_argument("--stages", default=",".join(config.PIPELINE_STAGES),
+                        help=f"Comma-separated stages to run, or 'all': {', '.join(STAGE_NAMES)}. "
+                             "Stages left out reuse their output from an earlier run.")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Ignore checkpoints and run every selected stage from scratch.")
+    parser.add_argument("--product-description", default=config.PRODUCT_DESCRIPTION,
+                        help="The product to find leads for.")
+
+    filters = parser.add_argument_group("filters")
+    filters.add_argument("--industry", action="append",
+                         help="LinkedIn industry to keep (repeatable). Defaults to config.industry_filter.")
+    filters.add_argument("--country", action="append",
+                         help="Two-letter country code to keep (repeatable). Defaults to config.country_filter.")
+    filters.add_argument("--size", action="append", type=parse_size_range,
+                         help="Employee-count range to keep, e.g. 50-750 (repeatable). Defaults to config.size_filter.")
+
+    paths = parser.add_argument_group("paths")
+    paths.add_argument("--output-dir", help="Directory for every output file. Defaults to config.output_dir.")
+    paths.add_argument("--storage", choices=["ndjson", "sqlite"],
+                       help="Format of the stage outputs. Defaults to config.STORAGE_FORMAT.")
+    paths.add_argument("--linkedin-file", help="LinkedIn company dump to merge with.")
+    paths.add_argument("--lead-plan-file", help="Where the lead plan is saved.")
+    paths.add_argument("--places-file", help="Where scraped Google Places records are saved.")
+    paths.add_argument("--merged-file", help="Where merged companies are saved.")
+    paths.add_argument("--scored-file", help="Where scored and ranked companies are saved.")
+    paths.add_argument("--verified-file", help="Where verified employees are saved.")
+
+    shards = parser.add_argument_group("sharding")
+    shards.add_argument("--workers", type=int, default=1,
+                          help="Run the Places and contact steps as this many worker processes, then merge their outputs.")
+    shards.add_argument("--shard", type=parse_shard,
+                          help="Run only this shard of the Places and contact steps, e.g. 2/8 (counting from 0).")
+    shards.add_argument("--shared-dir",
+                          help="Directory of the response cache, enrichment ledger and rate limits shared by workers. "
+                               "Defaults to the output directory.")
+
+    opts = parser.parse_args(argv)
+    if opts.workers < 1:
+        parser.error("--workers must be at least 1")
+    if opts.workers > 1 and opts.shard:
+        parser.error("--workers and --shard can't be used together")
+
+    stages = [stage.strip() for stage in opts.stages.split(",") if stage.strip()]
+    opts.stages = STAGE_NAMES if stages == ["all"] else stages
+    unknown = [stage for stage in opts.stages if stage not in STAGE_NAMES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    opts.industry = opts.industry or as_list(config.industry_filter)
+    opts.country = opts.country or as_list(config.country_filter)
+    opts.size = opts.size or config.size_filter
+    return opts
+
+def main(argv=None):
+    opts = parse_args(argv)
+    if opts.storage:
+        config.STORAGE_FORMAT = opts.storage
+    if opts.output_dir or opts.storage:
+        config.set_output_dir(opts.output_dir or config.output_dir)
+    config.ensure_output_dir()
+    if opts.shared_dir or opts.workers > 1:
+        config.set_shared_dir(opts.shared_dir or config.output_dir)
+    if opts.fresh:
+        config.RESUME_FROM_CHECKPOINT = False
+
+    opts.linkedin_file = opts.linkedin_file or config.linkedin_data_file
+    opts.lead_plan_file = opts.lead_plan_file or config.lead_plan_file
+    opts.places_file = opts.places_file or config.google_places_data_file
+    opts.merged_file = opts.merged_file or config.merged_data_file
+    opts.scored_file = opts.scored_file or config.scored_companies_file
+    opts.verified_file = opts.verified_file or config.verified_employees_file
+
+    print("--- Starting Lead Generation Pipeline ---")
+
+    # Stages run concurrently where their inputs allow, and stages whose inputs are
+    # unchanged since the last run are skipped.
+    statuses = Pipeline(build_pipeline(opts), config.pipeline_state_file).run(
+        enabled=opts.stages,
+        force=not config.RESUME_FROM_CHECKPOINT
+    )
+
+    # Only the API stages use the response cache, so there's nothing to report otherwise.
+    if "src.response_cache" in sys.modules:
+        sys.modules["src.response_cache"].get_cache().print_stats()
+    if "src.enrichment_ledger" in sys.modules:
+        sys.modules["src.enrichment_ledger"].get_ledger().print_stats()
+    metrics.write_report(config.run_report_file, config.METRICS_PROMETHEUS_FILE, config.API_COST_PER_CALL)
+
+    failed = [name for name, status in statuses.items() if status == "failed"]
+    if failed:
+        print(f"\n--- Pipeline finished with errors in: {', '.join(failed)} ---")
+        return 1
+    incomplete = [name for name, status in statuses.items() if status == "incomplete"]
+    if incomplete:
+        print(f"\n--- Pipeline finished with unfinished work in: {', '.join(incomplete)}. Run it again to retry. ---")
+        return EXIT_INCOMPLETE
     print("\n--- Pipeline finished successfully! ---")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+import gzip
+import json
+import os
+import threading
+from contextlib import contextmanager
+from .record_store import RecordStore, is_store_path
+
+
+def _open_text(filepath):
+    """Opens a file for reading as text, transparently decompressing gzip files."""
+    with open(filepath, 'rb') as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(filepath, 'rt', encoding='utf-8')
+    return open(filepath, 'r', encoding='utf-8')
+
+
+def _iter_json_array(f, chunk_size=1 << 20):
+    """
+    Parses a top-level JSON list incrementally, yielding one element at a time.
+
+    Only the current chunk and the element being decoded are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size)
+    while buffer.isspace():
+        buffer = f.read(chunk_size)
+    eof = not buffer
+    pos = buffer.index("[") + 1
+
+    while True:
+        # Skip the whitespace and commas between elements, reading more input if needed.
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ","):
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer = f.read(chunk_size)
+            eof = not buffer
+            pos = 0
+
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Unterminated JSON list", buffer, pos)
+        if buffer[pos] == "]":
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            end = None
+        # An element that runs to the end of the buffer may be truncated, so read more and retry.
+        if end is None or (end == len(buffer) and not eof):
+            if eof:
+                raise json.JSONDecodeError("Truncated JSON list", buffer, pos)
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        yield record
+        pos = end
+        if pos >= chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def _temp_path(filepath):
+    # The extension is kept, so a record store's temporary file is still recognised as one.
+    root, ext = os.path.splitext(filepath)
+    return f"{root}.tmp{ext}"
+
+
+@contextmanager
+def atomic_output(filepath):
+    """
+    Yields a temporary path to write a file's new contents to, which then replaces the file.
+
+    If the block raises, the temporary file is removed and the file is left as it was,
+    so a crash never leaves a half-written file behind.
+
+    Usage:
+        with atomic_output("state.json") as temp_path:
+            with open(temp_path, 'w') as f:
+                json.dump(state, f)
+    """
+    temp_path = _temp_path(filepath)
+    try:
+        yield temp_path
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, filepath)
+
+
+def read_records(filepath):
+    """
+    Streams records from a JSON file without loading the whole file into memory.
+
+    Accepts line-delimited JSON (NDJSON) as well as a single top-level JSON list,
+    optionally gzip-compressed, and SQLite record stores (see `record_store`).
+
+    Args:
+        filepath (str): The path to the file.
+
+    Yields:
+        dict: One record at a time.
+    """
+    if is_store_path(filepath):
+        with RecordStore(filepath) as store:
+            yield from store
+        return
+    with _open_text(filepath) as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from _iter_json_array(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def update_records(filepath, records, key):
+    """
+    Replaces stored records with newer versions, matched by `key` (e.g. "place_id").
+
+    Record stores are updated in place. NDJSON files are rewritten with an atomic `RecordWriter`.
+
+    Args:
+        filepath (str): The file the records were written to.
+        records (list): The new versions of the records.
+        key (str): The field that identifies a record.
+    """
+    updates = {record[key]: record for record in records}
+    if not updates:
+        return
+    if is_store_path(filepath):
+        with RecordStore(filepath, key=key) as store:
+            store.upsert_many(updates.values())
+        return
+    with RecordWriter(filepath, atomic=True) as writer:
+        for record in read_records(filepath):
+            writer.write(updates.get(record.get(key), record))
+
+
+class RecordWriter:
+    """
+    Appends records to an NDJSON file as they are produced.
+
+    Every record is flushed straight away, so a crash loses at most the record being
+    written. Safe to share between threads.
+
+    Paths ending in .sqlite or .db are written to a `RecordStore` instead, where `key`
+    (e.g. "place_id") makes a record that is already stored be updated rather than added.
+
+    With `atomic`, the records are written to a new temporary file that replaces `filepath`
+    when the writer is closed, like `atomic_output`; if the `with` block raises, the file is
+    left as it was. For outputs that are written in one go rather than added to.
+    """
+
+    def __init__(self, filepath, append=True, key=None, atomic=False):
+        self.filepath = filepath
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = self._store = None
+        self._temp_path = _temp_path(filepath) if atomic else None
+        path = self._temp_path or filepath
+        append = append and not atomic
+        if is_store_path(path):
+            self._store = RecordStore(path, key=key)
+            if not append:
+                self._store.clear()
+        else:
+            self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, record):
+        with self._lock:
+            if self._store is not None:
+                self._store.upsert(record)
+            else:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+            self.count += 1
+
+    def write_many(self, records):
+        if self._store is not None:
+            records = list(records)
+            with self._lock:
+                self._store.upsert_many(records)
+                self.count += len(records)
+            return
+        for record in records:
+            self.write(record)
+
+    def close(self, discard=False):
+        """Closes the file. An atomic writer then replaces `filepath`, or with `discard`, deletes its temporary file."""
+        with self._lock:
+            if self._store is not None:
+                self._store.close()
+            else:
+                self._file.close()
+        if self._temp_path:
+            if discard:
+                os.remove(self._temp_path)
+            else:
+                os.replace(self._temp_path, self.filepath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(discard=exc_type is not None)
+
+
+class Checkpoint:
+    """
+    Remembers which keys (search terms, place_ids, domains) a stage has finished.
+
+    Keys are appended to a small text file, one per line, so a restarted run can
+    skip work that was already completed. Safe to share between threads.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._done = set()
+        if os.path.exists(filepath):
+            with open(filepath, 'r', encoding='utf-8') as f:
+                self._done = {line.rstrip("\n") for line in f if line.strip()}
+        self._file = open(filepath, 'a', encoding='utf-8')
+
+    def __contains__(self, key):
+        return key in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def mark(self, key):
+        """Records a key as finished."""
+        with self._lock:
+            if key in self._done:
+                return
+            self._done.add(key)
+            self._file.write(f"{key}\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def checkpoint_path(output_file, name):
+    """Returns the path of a stage's checkpoint file, kept next to its output."""
+    return f"{output_file}.{name}.checkpoint"
+
+
+def clear_stage(output_file, *names):
+    """Deletes a stage's output and checkpoint files so it starts from scratch."""
+    for path in [output_file] + [checkpoint_path(output_file, name) for name in names]:
+        if os.path.exists(path):
+            os.remove(path)
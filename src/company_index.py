@@ -0,0 +1,307 @@
+import json
+import os
+import re
+import sys
+from array import array
+from .checkpoint import atomic_output, read_records
+
+INDEX_VERSION = 2
+
+# LinkedIn's company size ranges; the last bucket is open-ended.
+EMPLOYEE_BUCKETS = [(1, 10), (11, 50), (51, 200), (201, 500), (501, 1000),
+                    (1001, 5000), (5001, 10000), (10001, None)]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Splits an industry string into lower-case word tokens."""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def employee_count(company):
+    """
+    Reads a company's employee count from a LinkedIn record.
+
+    Uses 'employees_in_linkedin' when present, otherwise the lower bound of
+    'company_size' (e.g. "51-200 employees").
+
+    Returns:
+        int: The employee count, or -1 if unknown.
+    """
+    count = company.get("employees_in_linkedin")
+    if isinstance(count, (int, float)):
+        return int(count)
+    match = re.search(r"\d[\d,]*", str(company.get("company_size") or ""))
+    return int(match.group().replace(",", "")) if match else -1
+
+
+def _bucket_of(count):
+    for i, (low, high) in enumerate(EMPLOYEE_BUCKETS):
+        if count >= low and (high is None or count <= high):
+            return i
+    return None
+
+
+def _itemsizes():
+    """The byte size of each array type the index saves, which varies between platforms."""
+    return {typecode: array(typecode).itemsize for typecode in "QiI"}
+
+
+def _is_plain_ndjson(path):
+    """True if the file is uncompressed NDJSON, so records can be read straight from it by offset."""
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+    if head[:2] == b"\x1f\x8b":
+        return False
+    stripped = head.lstrip()
+    return bool(stripped) and not stripped.startswith(b"[")
+
+
+class CompanyIndex:
+    """
+    An inverted index over a LinkedIn company dump.
+
+    Postings are kept for industry tokens, country codes and employee-count buckets,
+    along with the byte offset of every record, so a query only reads the records it
+    returns. The index is saved to `<source>.index` and reused until the source changes:
+    `index.json` describes the arrays, which are stored one after another in `postings.bin`.
+    Nothing in the saved index is executed when it is loaded, so a shared dump's index
+    directory is safe to reuse.
+    """
+
+    def __init__(self, source_path, records_path, offsets, employees, industries, countries, size_buckets):
+        self.source_path = source_path
+        self.records_path = records_path
+        self.offsets = offsets
+        self.employees = employees
+        self.industries = industries
+        self.countries = countries
+        self.size_buckets = size_buckets
+
+    @staticmethod
+    def index_dir(source_path):
+        return f"{source_path}.index"
+
+    @staticmethod
+    def _source_stamp(source_path):
+        stat = os.stat(source_path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    @classmethod
+    def build(cls, source_path):
+        """
+        Builds the index with a single streaming pass over the source file and saves it.
+
+        Raises:
+            FileNotFoundError: If the source file doesn't exist; nothing is created.
+        """
+        # Checked before anything is printed or created, so a missing dump leaves no empty index behind.
+        source = cls._source_stamp(source_path)
+        print(f"🗂️  Building company index for '{source_path}'...")
+        index_dir = cls.index_dir(source_path)
+        os.makedirs(index_dir, exist_ok=True)
+
+        offsets = array("Q")
+        employees = array("i")
+        industries = {}
+        countries = {}
+        size_buckets = {}
+
+        def add_record(record_id, company):
+            for token in set(tokenize(company.get("industries"))):
+                industries.setdefault(token, array("I")).append(record_id)
+            for code in set(company.get("country_codes_array") or []):
+                countries.setdefault(code, array("I")).append(record_id)
+            count = employee_count(company)
+            employees.append(count)
+            bucket = _bucket_of(count)
+            if bucket is not None:
+                size_buckets.setdefault(bucket, array("I")).append(record_id)
+
+        if _is_plain_ndjson(source_path):
+            # Records are read back from the source itself.
+            records_path = source_path
+            with open(source_path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        offsets.append(offset)
+                        add_record(len(offsets) - 1, json.loads(line))
+                    offset += len(line)
+        else:
+            # JSON lists and gzip files can't be seeked into, so records are copied to an NDJSON sidecar.
+            records_path = os.path.join(index_dir, "records.ndjson")
+            with open(records_path, 'wb') as out:
+                for company in read_records(source_path):
+                    offsets.append(out.tell())
+                    out.write(json.dumps(company, ensure_ascii=False).encode("utf-8") + b"\n")
+                    add_record(len(offsets) - 1, company)
+
+        index = cls(source_path, records_path, offsets, employees, industries, countries, size_buckets)
+        index._save(source)
+        print(f"✅ Indexed {len(offsets)} companies.")
+        return index
+
+    def _arrays(self):
+        """Every saved array, with the name and key it is listed under in the header, in file order."""
+        yield "offsets", None, self.offsets
+        yield "employees", None, self.employees
+        for name, postings in (("industries", self.industries), ("countries", self.countries),
+                               ("size_buckets", self.size_buckets)):
+            for key, posting in postings.items():
+                yield name, key, posting
+
+    def _save(self, source):
+        index_dir = self.index_dir(self.source_path)
+        layout = []
+        # The arrays are written before the header that describes them, so an interrupted
+        # save leaves the old header, which no longer matches, rather than a half-written index.
+        with atomic_output(os.path.join(index_dir, "postings.bin")) as temp_path:
+            with open(temp_path, 'wb') as f:
+                for name, key, values in self._arrays():
+                    values.tofile(f)
+                    layout.append([name, key, values.typecode, len(values)])
+
+        header = {
+            "version": INDEX_VERSION,
+            "source": source,
+            "records_path": self.records_path,
+            "byteorder": sys.byteorder,
+            "itemsizes": _itemsizes(),
+            "arrays": layout,
+        }
+        with atomic_output(os.path.join(index_dir, "index.json")) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(header, f)
+
+    @classmethod
+    def _load(cls, source_path):
+        """Returns the saved index if it matches the source file and this machine, otherwise None."""
+        index_dir = cls.index_dir(source_path)
+        try:
+            with open(os.path.join(index_dir, "index.json"), 'r', encoding='utf-8') as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Arrays are saved in the machine's own layout, so an index built elsewhere is rebuilt.
+        if (header.get("version") != INDEX_VERSION or header.get("source") != cls._source_stamp(source_path)
+                or header.get("byteorder") != sys.byteorder or header.get("itemsizes") != _itemsizes()):
+            return None
+
+        loaded = {"industries": {}, "countries": {}, "size_buckets": {}}
+        try:
+            with open(os.path.join(index_dir, "postings.bin"), 'rb') as f:
+                for name, key, typecode, length in header["arrays"]:
+                    values = array(typecode)
+                    values.fromfile(f, length)
+                    if key is None:
+                        loaded[name] = values
+                    else:
+                        loaded[name][key] = values
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            return None
+        return cls(source_path, header["records_path"], loaded["offsets"], loaded["employees"],
+                   loaded["industries"], loaded["countries"], loaded["size_buckets"])
+
+    @classmethod
+    def load_or_build(cls, source_path):
+        """Loads the saved index for the source file, rebuilding it if it is missing or out of date."""
+        return cls._load(source_path) or cls.build(source_path)
+
+    def _token_postings(self, matches):
+        """Unions the postings of every indexed industry token accepted by `matches`."""
+        records = set()
+        for token, posting in self.industries.items():
+            if matches(token):
+                records.update(posting)
+        return records
+
+    def _industry_candidates(self, industry):
+        """
+        Records that could contain the industry phrase as a substring; confirmed in `search`.
+
+        Because the phrase is matched as a substring, its first word may be the end of a
+        longer word and its last word the start of one, so those are matched loosely.
+        """
+        tokens = tokenize(industry)
+        if not tokens:
+            return set(range(len(self.offsets)))
+        if len(tokens) == 1:
+            return self._token_postings(lambda token: tokens[0] in token)
+
+        postings = [set(self.industries.get(token, ())) for token in tokens[1:-1]]
+        postings.append(self._token_postings(lambda token: token.endswith(tokens[0])))
+        postings.append(self._token_postings(lambda token: token.startswith(tokens[-1])))
+        postings.sort(key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            candidates &= posting
+        return candidates
+
+    def _size_candidates(self, size_ranges):
+        candidates = set()
+        for low, high in size_ranges:
+            low = low or 0
+            for i, (bucket_low, bucket_high) in enumerate(EMPLOYEE_BUCKETS):
+                if (high is None or bucket_low <= high) and (bucket_high is None or bucket_high >= low):
+                    candidates.update(
+                        record_id for record_id in self.size_buckets.get(i, ())
+                        if self.employees[record_id] >= low and (high is None or self.employees[record_id] <= high)
+                    )
+        return candidates
+
+    def query(self, industries=None, countries=None, size_ranges=None):
+        """
+        Finds the records that match the filters.
+
+        A record matches if it matches any of the values given for each filter, and every
+        filter that is given. Industries keep the substring semantics of
+        `data_processor.filter_linkedin_data`; that check happens in `search`.
+
+        Args:
+            industries (list, optional): Industry names, e.g. ["Information Technology & Services"].
+            countries (list, optional): Two-letter country codes, e.g. ["IN", "US"].
+            size_ranges (list, optional): (min, max) employee counts; either bound may be None.
+
+        Returns:
+            list: The sorted IDs of the candidate records.
+        """
+        filters = []
+        if industries:
+            filters.append(set().union(*(self._industry_candidates(industry) for industry in industries)))
+        if countries:
+            filters.append(set().union(*(self.countries.get(code, ()) for code in countries)))
+        if size_ranges:
+            filters.append(self._size_candidates(size_ranges))
+        if not filters:
+            return list(range(len(self.offsets)))
+
+        filters.sort(key=len)
+        matches = filters[0]
+        for other in filters[1:]:
+            matches = matches & other
+        return sorted(matches)
+
+    def iter_records(self, record_ids):
+        """Reads the given records from disk, in ID order."""
+        with open(self.records_path, 'rb') as f:
+            for record_id in record_ids:
+                f.seek(self.offsets[record_id])
+                yield json.loads(f.readline())
+
+    def search(self, industries=None, countries=None, size_ranges=None):
+        """
+        Runs a query and returns the matching company records.
+
+        Args are the same as for `query`.
+
+        Returns:
+            list: The matching company dictionaries.
+        """
+        results = []
+        for company in self.iter_records(self.query(industries, countries, size_ranges)):
+            if industries and not any(industry in (company.get("industries") or "") for industry in industries):
+                continue
+            results.append(company)
+        return results
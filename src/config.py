@@ -1,40 +1,198 @@
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# --- Environment Settings ---
+# These are read from the environment or the .env file the first time they are used
+# (see __getattr__ at the bottom), so importing this module has no side effects.
+ENV_SETTINGS = {
+    # API Keys
+    "GOOGLE_PLACES_API_KEY": None,
+    "APOLLO_API_KEY": None,
+    "NEVERBOUNCE_API_KEY": None,
+    "GEMINI_API_KEY": None,
+    "HUGGINGFACE_API_TOKEN": None,  # Note: This token is not currently used but is kept for future expansion.
+    # Example: http://localhost:11434 if running Ollama locally
+    "OLLAMA_BASE_URL": "http://localhost:11434",
+    # Override the base URLs to point the API clients at local stub servers.
+    "GOOGLE_PLACES_BASE_URL": "https://maps.googleapis.com/maps/api/place",
+    "APOLLO_BASE_URL": "https://api.apollo.io",
+    "NEVERBOUNCE_BASE_URL": "https://api.neverbounce.com/v4",
+}
 
-# --- API Keys ---
-GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
-APOLLO_API_KEY = os.getenv("APOLLO_API_KEY")
-NEVERBOUNCE_API_KEY = os.getenv("NEVERBOUNCE_API_KEY")
-GEMINI_API_KEY=os.getenv("GEMINI_API_KEY")
-HUGGINGFACE_API_TOKEN = os.getenv("HUGGINGFACE_API_TOKEN") # Note: This token is not currently used but is kept for future expansion.
 # --- LLM & Ollama Settings ---
-# Example: http://localhost:11434 if running Ollama locally
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+LLM_PLAN_STREAMING = True  # Stream target groups one at a time instead of waiting for the whole plan
+LLM_GROUP_RETRIES = 2  # Extra attempts at regenerating a target group the LLM got wrong
+LLM_REGENERATION_WORKERS = 3  # Invalid target groups regenerated at once
+
+# --- Google Places Settings ---
+PLACES_DETAILS_CONCURRENCY = 8  # Number of Place Details requests in flight at once
+PLACES_SEARCH_CONCURRENCY = 4  # Number of search terms scraped at once
+PLACES_MAX_PAGES = 3  # Text Search pages per term; Google returns at most 3 pages of 20
+PLACES_PAGE_TOKEN_RETRY_DELAY = 0.25  # First wait before retrying a next_page_token that isn't valid yet
+PLACES_PAGE_TOKEN_TIMEOUT = 10  # Give up on a next_page_token after this many seconds
 
 # --- Pipeline Settings ---
 PRODUCT_DESCRIPTION = "An AI-powered platform that automates ESG (Environmental, Social, and Governance) compliance reporting for mid-sized manufacturing companies (50-750 employees). It saves time, reduces audit risk, and helps companies improve their sustainability scores."
+# Merged companies are scored from 0 to 10 (see src/lead_scoring.py); only those scoring
+# LEAD_SCORE_THRESHOLD or higher go on to contact finding, best first.
 LEAD_SCORE_THRESHOLD = 7.0
+# Apollo's people search is asked for these titles and seniorities only, and people whose job
+# title doesn't contain every significant word of one of the personas aren't verified.
 CONTACT_PERSONAS = ["Head of Sustainability", "Compliance Officer", "Chief Financial Officer", "VP of Operations"]
+CONTACT_SENIORITIES = ["c_suite", "vp", "head", "director"]  # Apollo seniority values; empty for any
 SCORING_WEIGHTS = {
     "employee_count": 0.5,
     "industry": 0.5
 }
+SCORING_EMPLOYEE_RANGE = (50, 750)  # Employee counts that score full marks, when --size isn't given
+SCORING_KEEP_UNSCORED = True  # Keep companies with no data to score, e.g. unmatched Places records, after the scored ones
 
 # --- File Paths ---
-output_dir = "output"
-linkedin_data_file = os.path.join(output_dir, "LinkedIn_company_information.json")
-google_places_data_file = os.path.join(output_dir, "companies.json")
-merged_data_file = os.path.join(output_dir, "final_merged_companies.json")
-verified_employees_file = os.path.join(output_dir, "verified_employees.json")
-lead_plan_file = os.path.join(output_dir, "lead_plan.json")
+# Stage outputs are line-delimited JSON (one record per line), appended as records are produced.
+# `pipeline_state_file` holds content hashes of each stage's inputs, used to skip unchanged stages.
+# With STORAGE_FORMAT = "sqlite" the places, merged, scored and verified outputs are SQLite record stores
+# instead (see src/record_store.py): records compressed in blocks, keyed by place_id or email and
+# updated in place. `python -m src.record_store <store> <file.json>` exports one to JSON.
+STORAGE_FORMAT = "ndjson"
+OUTPUT_FILES = {
+    "linkedin_data_file": "LinkedIn_company_information.json",
+    "google_places_data_file": "companies.ndjson",
+    "merged_data_file": "final_merged_companies.ndjson",
+    "scored_companies_file": "scored_companies.ndjson",
+    "verified_employees_file": "verified_employees.ndjson",
+    "lead_plan_file": "lead_plan.json",
+    "cache_file": "api_cache.sqlite",
+    "run_report_file": "run_report.json",
+    "pipeline_state_file": "pipeline_state.json",
+    "enrichment_ledger_file": "enrichment_ledger.sqlite",
+    "rate_limit_file": "rate_limits.sqlite",
+}
+
+def set_output_dir(path):
+    """Points every file path above at a new output directory."""
+    global output_dir
+    output_dir = path
+    for name, filename in OUTPUT_FILES.items():
+        if STORAGE_FORMAT == "sqlite" and filename.endswith(".ndjson"):
+            filename = filename[:-len(".ndjson")] + ".sqlite"
+        globals()[name] = os.path.join(path, filename)
+
+def set_shared_dir(path):
+    """
+    Points the files shard workers share (the response cache, the enrichment ledger
+    and the rate limits) at a shared directory, and enforces RATE_LIMITS across processes.
+    """
+    global SHARED_RATE_LIMITS
+    for name in SHARED_FILES:
+        globals()[name] = os.path.join(path, OUTPUT_FILES[name])
+    SHARED_RATE_LIMITS = True
+
+def ensure_output_dir():
+    """Creates the output directory if it doesn't exist yet."""
+    os.makedirs(output_dir, exist_ok=True)
 
-# Ensure output directory exists
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
+set_output_dir("output")
+
+# --- Pipeline Stages ---
+# Stages main.py runs when --stages isn't given. The others reuse their output from an earlier run.
+PIPELINE_STAGES = ["generate_search_terms", "scrape_google_places"]
+
+# --- Sharding ---
+# `main.py --workers N` runs the Places and contact stages as N worker processes. Each worker
+# takes the search terms or domains whose stable hash falls in its shard, and the shards'
+# outputs are merged afterwards. `main.py --shard I/N --shared-dir DIR` runs one worker, e.g.
+# on another machine. Workers share these files in the shared directory:
+SHARED_FILES = ["cache_file", "enrichment_ledger_file", "rate_limit_file"]
+SHARED_RATE_LIMITS = False  # Enforce RATE_LIMITS across processes through rate_limit_file
+
+# --- Checkpointing ---
+# When True, a restarted run skips the search terms, places and domains already
+# recorded in each stage's checkpoint file. Set to False to start every stage fresh.
+RESUME_FROM_CHECKPOINT = True
+
+# --- HTTP Client ---
+# Every outbound API call goes through src/http_client.py, which applies these settings.
+HTTP_TIMEOUT = 30  # Seconds before a request times out
+HTTP_MAX_RETRIES = 4  # Retries on connection errors, timeouts, 429 and 5xx responses
+HTTP_BACKOFF_BASE = 0.5  # Seconds; doubled on each retry, with jitter
+HTTP_BACKOFF_MAX = 30  # Upper bound on a single backoff delay
+HTTP_RETRY_AFTER_MAX = 120  # Upper bound on how long a Retry-After header can make us wait
+# Token-bucket rate limits and circuit breakers per provider. Set these to your plan's limits.
+RATE_LIMITS = {
+    "google_places": {"requests_per_second": 10, "burst": 10, "failure_threshold": 10, "reset_timeout": 30},
+    "apollo": {"requests_per_second": 2, "burst": 5, "failure_threshold": 5, "reset_timeout": 60},
+    "neverbounce": {"requests_per_second": 5, "burst": 5, "failure_threshold": 5, "reset_timeout": 60},
+}
+
+# --- API Response Cache ---
+# Paid API responses are cached on disk so re-runs only hit the network for new requests.
+CACHE_ENABLED = True
+CACHE_MAX_ENTRIES = 200000
+CACHE_TTLS = {  # Seconds before a cached response is considered stale
+    "places_textsearch": 7 * 24 * 3600,
+    "places_details": 30 * 24 * 3600,
+    "apollo_enrich": 30 * 24 * 3600,
+    "apollo_people_search": 7 * 24 * 3600,
+    "neverbounce_email": 30 * 24 * 3600,
+    "llm_plan": 30 * 24 * 3600,
+}
+
+# --- Enrichment Ledger ---
+# The contact step remembers every domain, Apollo organization, person and email it has checked,
+# and the result, across runs. Items checked within their freshness window aren't looked up again,
+# so a refresh only pays for new companies, new people and stale verifications.
+ENRICHMENT_LEDGER_ENABLED = True
+ENRICHMENT_FRESHNESS = {  # Seconds a ledger entry is trusted before the item is checked again
+    "domain": 90 * 24 * 3600,  # Domain -> Apollo organization ID
+    "organization": 30 * 24 * 3600,  # Organization -> the people found there
+    "person": 30 * 24 * 3600,  # The person records themselves
+    "email": 30 * 24 * 3600,  # Email verification results
+}
+
+# --- Run Report ---
+# Stage timings, per-endpoint latency and call counts are written to run_report_file after each run.
+METRICS_PROMETHEUS_FILE = None  # Optional path for the same metrics in Prometheus text format
+API_COST_PER_CALL = {}  # Price per call by endpoint, e.g. {"apollo_enrich": 0.01}, for a spend estimate
+
+# --- Contact Finder Pipeline ---
+APOLLO_ENRICH_WORKERS = 4  # Concurrent organizations/bulk_enrich requests
+APOLLO_BULK_ENRICH_SIZE = 10  # Domains per bulk enrichment request; Apollo accepts up to 10
+APOLLO_PEOPLE_PER_PAGE = 100  # Largest people search page to ask for; Apollo allows up to 100
+APOLLO_SEARCH_WORKERS = 4  # Concurrent mixed_people/search pagers
+VERIFICATION_WORKERS = 2  # Bulk verification batches in flight at once
+CONTACT_PIPELINE_QUEUE_SIZE = 100  # Bound on the queues between pipeline stages
+APOLLO_MAX_PAGES_PER_COMPANY = 5
+APOLLO_MAX_PEOPLE_PER_COMPANY = 100
+VERIFICATION_BATCH_SIZE = 500  # People per bulk verification batch
+VERIFICATION_BATCH_WAIT = 30  # Seconds a partial batch waits for more people before it is sent
+
+# --- Email Verification ---
+NEVERBOUNCE_BULK_JOB_SIZE = 10000  # Maximum number of emails submitted in one bulk job
+NEVERBOUNCE_POLL_INTERVAL = 5  # Seconds between job status checks
+NEVERBOUNCE_JOB_TIMEOUT = 3600  # Give up waiting on a bulk job after this many seconds
 
 # --- Filters for Data Processor ---
+# Each filter may be a single value or a list; a company matches any value in a list.
 industry_filter = "Information Technology & Services"
 country_filter = "IN"
+size_filter = None  # Optional list of (min, max) employee counts, e.g. [(50, 750)]
+# Query the LinkedIn dump through an inverted index cached next to it, instead of a full scan.
+LINKEDIN_INDEX_ENABLED = True
+
+# --- Lazy Environment Loading ---
+_env_loaded = False
+
+def load_env():
+    """Loads the .env file into the environment, once."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def __getattr__(name):
+    # Only called for names not defined above, so a value assigned at runtime
+    # (e.g. config.APOLLO_BASE_URL = "http://localhost:8000") takes precedence.
+    if name in ENV_SETTINGS:
+        load_env()
+        return os.getenv(name, ENV_SETTINGS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,106 +1,508 @@
 import requests
+import hashlib
 import json
-from urllib.parse import urlparse
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import os
-from . import config
-from .email_verifier import verify_email
+from . import config, email_verifier, http_client
+from .checkpoint import Checkpoint, RecordWriter, checkpoint_path, clear_stage, read_records
+from .enrichment_ledger import get_ledger
+from .entity_resolution import normalize_domain
+from .lead_scoring import matches_persona
+from .response_cache import get_cache
+
+# Marks the end of a stage's input. Each worker puts it back before exiting so its peers see it too.
+_DONE = object()
 
 # --- HELPER FUNCTIONS ---
 def get_domain(url):
     """Extracts the domain name from a URL."""
-    try:
-        parsed_uri = urlparse(url)
-        domain = parsed_uri.netloc
-        return domain[4:] if domain.startswith('www.') else domain
-    except Exception:
+    return normalize_domain(url)
+
+def _apollo_headers():
+    return {"X-Api-Key": config.APOLLO_API_KEY, "Content-Type": "application/json"}
+
+def enrich_company(domain):
+    """
+    Looks up a company's Apollo organization ID by its domain.
+
+    Args:
+        domain (str): The company's domain, e.g. "acme.com".
+
+    Returns:
+        str: The Apollo organization ID, or None if Apollo doesn't know the company.
+
+    Raises:
+        requests.exceptions.RequestException: If the Apollo request still fails after retries.
+    """
+    enrich_url = f"{config.APOLLO_BASE_URL}/api/v1/organizations/enrich"
+    params = {"domain": domain}
+
+    def fetch_organization():
+        response = http_client.request(
+            "apollo", "GET", enrich_url, endpoint="apollo_enrich", headers=_apollo_headers(), params=params
+        )
+        return response.json()
+
+    data = get_cache().cached("apollo_enrich", {"domain": domain.lower()}, fetch_organization)
+    return (data.get("organization") or {}).get("id")
+
+def enrich_companies(domains):
+    """
+    Looks up the Apollo organization IDs of many domains, in bulk requests.
+
+    Cached domains aren't requested again; the rest are sent to Apollo's bulk
+    enrichment endpoint, up to config.APOLLO_BULK_ENRICH_SIZE domains per request.
+    Results are matched back by domain. Apollo may report a different primary domain,
+    e.g. a regional site, so a domain with no match is looked up on its own with
+    `enrich_company` instead of being recorded as unknown.
+
+    Args:
+        domains (list): Company domains, e.g. ["acme.com", "globex.com"].
+
+    Returns:
+        dict: The Apollo organization ID of each domain, or None where Apollo doesn't know the company.
+
+    Raises:
+        requests.exceptions.RequestException: If an Apollo request still fails after retries.
+    """
+    cache = get_cache()
+    results = {}
+    pending = []
+    for domain in dict.fromkeys(domains):
+        # Shares entries with enrich_company, which caches the same response shape per domain.
+        hit, data = cache.get("apollo_enrich", {"domain": domain.lower()})
+        if hit:
+            results[domain] = (data.get("organization") or {}).get("id")
+        else:
+            pending.append(domain)
+
+    bulk_url = f"{config.APOLLO_BASE_URL}/api/v1/organizations/bulk_enrich"
+    batch_size = config.APOLLO_BULK_ENRICH_SIZE
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        response = http_client.request(
+            "apollo", "POST", bulk_url, endpoint="apollo_bulk_enrich", headers=_apollo_headers(),
+            json={"domains": batch}
+        )
+        organizations = {}
+        for organization in response.json().get("organizations") or []:
+            if organization:
+                domain = normalize_domain(organization.get("primary_domain") or organization.get("website_url"))
+                organizations[domain] = organization
+        for domain in batch:
+            organization = organizations.get(normalize_domain(domain))
+            if organization:
+                cache.set("apollo_enrich", {"domain": domain.lower()}, {"organization": organization})
+                results[domain] = organization.get("id")
+            else:
+                results[domain] = enrich_company(domain)
+    return results
+
+def search_filters():
+    """
+    The persona filters sent with every people search, from config.CONTACT_PERSONAS
+    and config.CONTACT_SENIORITIES. Empty filters are left out.
+    """
+    filters = {}
+    if config.CONTACT_PERSONAS:
+        filters["person_titles"] = list(config.CONTACT_PERSONAS)
+    if config.CONTACT_SENIORITIES:
+        filters["person_seniorities"] = list(config.CONTACT_SENIORITIES)
+    return filters
+
+def search_people(company_id, max_pages=None, max_people=None, filters=None):
+    """
+    Pages through Apollo's people search for one company.
+
+    The persona filters and the per-company cap are sent with the query, so Apollo
+    only returns people worth verifying and pages are no larger than needed.
+
+    Args:
+        company_id (str): The Apollo organization ID.
+        max_pages (int, optional): Stop after this many pages. Defaults to config.APOLLO_MAX_PAGES_PER_COMPANY.
+        max_people (int, optional): Stop after this many people. Defaults to config.APOLLO_MAX_PEOPLE_PER_COMPANY.
+        filters (dict, optional): Extra search parameters. Defaults to search_filters().
+
+    Yields:
+        list: One page of people records at a time.
+
+    Raises:
+        requests.exceptions.RequestException: If an Apollo request still fails after retries.
+    """
+    max_pages = max_pages or config.APOLLO_MAX_PAGES_PER_COMPANY
+    max_people = max_people or config.APOLLO_MAX_PEOPLE_PER_COMPANY
+    filters = search_filters() if filters is None else filters
+    per_page = min(max_people, config.APOLLO_PEOPLE_PER_PAGE)
+    search_url = f"{config.APOLLO_BASE_URL}/v1/mixed_people/search"
+    found = 0
+
+    for page in range(1, max_pages + 1):
+        payload = {"q_organization_ids": [company_id], "page": page, "per_page": per_page, **filters}
+
+        def fetch_people():
+            search_response = http_client.request(
+                "apollo", "POST", search_url, endpoint="apollo_people_search", headers=_apollo_headers(), json=payload
+            )
+            return search_response.json()
+
+        search_data = get_cache().cached("apollo_people_search", payload, fetch_people)
+        people = search_data.get("people", [])
+
+        if not people:
+            return
+
+        page_size = len(people)
+        people = people[:max_people - found]
+        found += len(people)
+        yield people
+
+        # A short page is the last one, so there's no need to ask for the next.
+        if found >= max_people or page_size < per_page:
+            return
+
+# --- PIPELINE STAGES ---
+def _start_workers(num_workers, in_queue, handle):
+    """Starts worker threads that call `handle(item)` for every item until the end marker arrives."""
+    def worker():
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                in_queue.put(_DONE)
+                return
+            try:
+                handle(item)
+            except Exception as e:
+                print(f"❌ Unexpected error in contact pipeline: {e}")
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(num_workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def _verify_batch(pages):
+    """
+    Verifies one batch of people in bulk.
+
+    Emails with a fresh result in the enrichment ledger aren't sent to NeverBounce again.
+
+    Args:
+        pages (list): (domain, people) pairs, as produced by the search stage.
+
+    Returns:
+        tuple: (verified, unresolved) where `verified` is the people with a valid email and
+               `unresolved` the emails NeverBounce couldn't give a result for, e.g. because
+               the bulk job failed.
+    """
+    people = [person for _, page in pages for person in page]
+    emails = {(person.get("email") or "").strip().lower() for person in people} - {""}
+    ledger = get_ledger()
+    results = ledger.get_many("email", emails)
+    checked = email_verifier.verify_emails_bulk(email for email in emails if email not in results)
+    ledger.record_many("email", {
+        email: result for email, result in checked.items() if result != "verification_error"
+    })
+    results.update(checked)
+    verified = []
+    unresolved = set()
+    for person in people:
+        email = (person.get("email") or "").strip().lower()
+        verification_result = results.get(email, "not_provided")
+        print(f"  - {email}: {verification_result.upper()}")
+
+        if verification_result == 'valid':
+            person['email_verification_status'] = verification_result
+            verified.append(person)
+        elif verification_result == 'verification_error':
+            unresolved.add(email)
+    return verified, unresolved
+
+def _run_verification(people_queue, on_verified):
+    """
+    Drains the people queue into bulk verification batches.
+
+    A batch is sent once it reaches VERIFICATION_BATCH_SIZE people, or once it has waited
+    VERIFICATION_BATCH_WAIT seconds, so verification keeps pace with a slow search stage.
+    `on_verified(pages, verified, unresolved)` is called from a worker thread as each batch finishes.
+    """
+    def verify(pages):
+        try:
+            on_verified(pages, *_verify_batch(pages))
+        except Exception as e:
+            print(f"❌ Error verifying emails: {e}")
+
+    batch = []
+    batch_size = 0
+    deadline = None
+
+    with ThreadPoolExecutor(max_workers=config.VERIFICATION_WORKERS) as pool:
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = people_queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _DONE:
+                break
+            if item:
+                batch.append(item)
+                batch_size += len(item[1])
+                deadline = deadline or time.monotonic() + config.VERIFICATION_BATCH_WAIT
+
+            if batch and (batch_size >= config.VERIFICATION_BATCH_SIZE or time.monotonic() >= deadline):
+                print(f"\n--- Verifying emails for {batch_size} people ---")
+                pool.submit(verify, batch)
+                batch = []
+                batch_size = 0
+                deadline = None
+
+        if batch:
+            print(f"\n--- Verifying emails for {batch_size} people ---")
+            pool.submit(verify, batch)
+
+def _with_persona(people):
+    """Keeps the people whose job title matches one of the CONTACT_PERSONAS."""
+    return [person for person in people if matches_persona(person.get("title"))]
+
+def _known_people(ledger, search_key):
+    """
+    Returns the people found by an organization's search on an earlier run, or None
+    if the organization, or any of its people, needs to be searched again.
+    """
+    fresh, person_ids = ledger.get("organization", search_key)
+    if not fresh:
         return None
+    people = ledger.get_many("person", person_ids)
+    if len(people) < len(set(person_ids)):
+        return None
+    return [people[person_id] for person_id in dict.fromkeys(person_ids)]
+
+class _DomainProgress:
+    """
+    Tracks when every page found for a domain has been verified, so the domain can be
+    checkpointed only once all of its people are safely written out.
+    """
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+        self._pending = {}
+        self._searched = set()
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def page_found(self, domain):
+        with self._lock:
+            self._pending[domain] = self._pending.get(domain, 0) + 1
+
+    def search_finished(self, domain):
+        with self._lock:
+            self._searched.add(domain)
+            self._mark_if_done(domain)
+
+    def page_verified(self, domain):
+        with self._lock:
+            self._pending[domain] -= 1
+            self._mark_if_done(domain)
+
+    def page_failed(self, domain):
+        """A page some of whose emails couldn't be verified; its domain is left for the next run."""
+        with self._lock:
+            self._pending[domain] -= 1
+            self._failed.add(domain)
+
+    def _mark_if_done(self, domain):
+        if domain in self._failed:
+            return
+        if domain in self._searched and not self._pending.get(domain):
+            self._pending.pop(domain, None)
+            self._searched.discard(domain)
+            self.checkpoint.mark(domain)
 
 # --- MAIN SCRIPT FUNCTION ---
-def find_and_verify_contacts(input_file, output_file):
+def find_and_verify_contacts(input_file, output_file, max_pages=None, max_people=None, shard=None,
+                             unfinished=None):
     """
     Finds employees for companies in the input file, verifies their emails, and saves the result.
-    
+
+    Domain enrichment, people search and email verification run as a pipeline, each
+    stage on its own worker pool with bounded queues in between, so slow verification
+    doesn't hold up the Apollo searches. Verified employees are appended to the output
+    as each batch finishes, and finished domains are checkpointed so a run that was
+    interrupted or left domains unfinished can be resumed without redoing the rest.
+    Once a run finishes every domain its checkpoint is removed, so the next run is a
+    refresh: it starts a new output, and the ledger decides what is looked up again.
+
+    Companies are read in the input's order, so with the ranked output of the scoring
+    stage the best leads are searched first. Domains are enriched in bulk, and the
+    CONTACT_PERSONAS titles, CONTACT_SENIORITIES and per-company cap are sent with
+    each people search, so Apollo only returns relevant people. Titles are checked
+    again locally before verification, since Apollo's title matching is loose.
+
+    Every lookup is recorded in the enrichment ledger (see src/enrichment_ledger.py).
+    Domains, organizations, people and emails checked within their ENRICHMENT_FRESHNESS
+    window are taken from the ledger, so a refresh of known accounts only calls Apollo
+    and NeverBounce for new companies, new people and stale verifications.
+
     Args:
-        input_file (str): The path to the JSON file containing company data.
-        output_file (str): The path where the verified employee data will be saved.
+        input_file (str): The path to the NDJSON file containing company data.
+        output_file (str): The path of the NDJSON file verified employees are appended to.
+        max_pages (int, optional): Maximum Apollo search pages fetched per company.
+        max_people (int, optional): Maximum people collected per company.
+        shard (sharding.Shard, optional): Only process the domains this shard owns.
+        unfinished (set, optional): Domains left unfinished, to be retried by the next run,
+            are added to this set.
+
+    Returns:
+        int: The number of verified employees written in this run.
     """
     if not config.APOLLO_API_KEY or not config.NEVERBOUNCE_API_KEY:
         print("⚠️  Error: Please provide both your Apollo and NeverBounce API keys in src/config.py.")
-        return
+        return 0
 
-    all_verified_employees = []
-    try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            companies_data = json.load(f)
-    except FileNotFoundError:
+    if not os.path.exists(input_file):
         print(f"❌ Error: The file '{input_file}' was not found. Please run the previous steps.")
-        return
-    except json.JSONDecodeError:
-        print(f"❌ Error: Could not decode JSON from '{input_file}'.")
-        return
+        return 0
 
-    for company in companies_data:
-        company_name = company.get("name", "Unknown")
-        domain = get_domain(company.get("website", ""))
+    # The checkpoint only outlives a run that didn't finish; without one this is a new run.
+    domains_path = checkpoint_path(output_file, "domains")
+    if not config.RESUME_FROM_CHECKPOINT or not os.path.exists(domains_path):
+        clear_stage(output_file, "domains")
+    domains_done = Checkpoint(domains_path)
+    progress = _DomainProgress(domains_done)
+    writer = RecordWriter(output_file, key="email")
+    ledger = get_ledger()
 
-        if not domain:
-            print(f"\n--- Skipping {company_name}: Invalid website. ---")
-            continue
+    company_queue = queue.Queue(maxsize=config.CONTACT_PIPELINE_QUEUE_SIZE)
+    org_queue = queue.Queue(maxsize=config.CONTACT_PIPELINE_QUEUE_SIZE)
+    people_queue = queue.Queue(maxsize=config.CONTACT_PIPELINE_QUEUE_SIZE)
 
-        print(f"\n--- Processing: {company_name} ({domain}) ---")
+    # STEP 1: Find the company IDs, a batch of domains per request
+    def enrich(companies):
+        domains = [domain for _, domain in companies]
+        company_ids = ledger.get_many("domain", domains)
+        unknown = [domain for domain in domains if domain not in company_ids]
+        if unknown:
+            try:
+                found = enrich_companies(unknown)
+            except requests.exceptions.RequestException as err:
+                # Leave these domains unfinished so the next run retries them.
+                print(f"❌ Error finding companies {', '.join(unknown)}: {err}")
+                found = {}
+            ledger.record_many("domain", found)
+            company_ids.update(found)
 
-        # STEP 1: Find the company ID
-        company_id = None
-        try:
-            enrich_url = "https://api.apollo.io/api/v1/organizations/enrich"
-            headers = {"X-Api-Key": config.APOLLO_API_KEY, "Content-Type": "application/json"}
-            params = {"domain": domain}
-            response = requests.get(enrich_url, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
-            company_id = data.get("organization", {}).get("id")
+        for company_name, domain in companies:
+            if domain not in company_ids:
+                continue
+            print(f"\n--- Processing: {company_name} ({domain}) ---")
+            company_id = company_ids[domain]
             if company_id:
                 print(f"✅ Found Apollo Company ID: {company_id}")
+                org_queue.put((company_name, domain, company_id))
             else:
                 print(f"❌ Could not find company ID for {domain}.")
-                continue
-        except requests.exceptions.HTTPError as err:
-            print(f"❌ HTTP Error finding company: {err}")
-            continue
+                domains_done.mark(domain)
 
-        # STEP 2: Find all employees
-        page = 1
+    # STEP 2: Find the company's employees, up to the per-company caps
+    filters = search_filters()
+    # People found under different filters aren't the same list, so the filters are part of the key.
+    filters_digest = hashlib.sha256(json.dumps(filters, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def search(org):
+        company_name, domain, company_id = org
+        search_key = f"{company_id}:{filters_digest}" if filters else company_id
+        people = _known_people(ledger, search_key)
+        if people is not None:
+            print(f"📒 Reusing {len(people)} known people at {company_name}.")
+            people = _with_persona(people)
+            if people:
+                progress.page_found(domain)
+                people_queue.put((domain, people))
+            progress.search_finished(domain)
+            return
+
+        person_ids = []
         try:
-            while True:
-                search_url = "https://api.apollo.io/v1/mixed_people/search"
-                payload = {"q_organization_ids": [company_id], "page": page}
-                search_response = requests.post(search_url, headers=headers, json=payload)
-                search_response.raise_for_status()
-                search_data = search_response.json()
-                people = search_data.get("people", [])
-
-                if not people:
-                    break
-
-                # STEP 3: Verify emails and append valid ones to the list
-                for person in people:
-                    email = person.get("email")
-                    verification_result = email_verifier.verify_email(email)
-                    print(f"  - Verifying {email}... Result: {verification_result.upper()}")
-
-                    if verification_result == 'valid':
-                        person['email_verification_status'] = verification_result
-                        all_verified_employees.append(person)
-
-                page += 1
-        except requests.exceptions.HTTPError as err:
-            print(f"❌ HTTP Error finding employees: {err}")
-
-    # STEP 4: Save the final list to the output file
-    if all_verified_employees:
-        print(f"\n✅ Writing {len(all_verified_employees)} verified employees to {output_file}...")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(all_verified_employees, f, indent=4)
+            for people in search_people(company_id, max_pages=max_pages, max_people=max_people, filters=filters):
+                # Copies, since verification adds fields to the people it passes.
+                records = {person["id"]: dict(person) for person in people if person.get("id")}
+                ledger.record_many("person", records)
+                person_ids.extend(records)
+                people = _with_persona(people)
+                if people:
+                    progress.page_found(domain)
+                    people_queue.put((domain, people))
+        except requests.exceptions.RequestException as err:
+            # Leave the domain unfinished so the next run retries it.
+            print(f"❌ Error finding employees for {company_name}: {err}")
+            return
+        ledger.record("organization", search_key, person_ids)
+        progress.search_finished(domain)
+
+    # STEP 3: Verify emails in bulk batches as people arrive, appending the valid ones
+    def save_verified(pages, verified, unresolved):
+        writer.write_many(verified)
+        for domain, people in pages:
+            if any((person.get("email") or "").strip().lower() in unresolved for person in people):
+                progress.page_failed(domain)
+            else:
+                progress.page_verified(domain)
+
+    enrich_workers = _start_workers(config.APOLLO_ENRICH_WORKERS, company_queue, enrich)
+    search_workers = _start_workers(config.APOLLO_SEARCH_WORKERS, org_queue, search)
+    verifier = threading.Thread(target=_run_verification, args=(people_queue, save_verified))
+    verifier.start()
+
+    queued = set()
+    batch = []
+    try:
+        for company in read_records(input_file):
+            company_name = company.get("name", "Unknown")
+            domain = get_domain(company.get("website", ""))
+
+            if not domain:
+                print(f"\n--- Skipping {company_name}: Invalid website. ---")
+                continue
+            if shard and not shard.owns(domain):
+                continue
+            if domain in domains_done or domain in queued:
+                continue
+            queued.add(domain)
+            batch.append((company_name, domain))
+            if len(batch) >= config.APOLLO_BULK_ENRICH_SIZE:
+                company_queue.put(batch)
+                batch = []
+    except json.JSONDecodeError:
+        print(f"❌ Error: Could not decode JSON from '{input_file}'.")
+    if batch:
+        company_queue.put(batch)
+
+    # Shut the stages down in order so every queued item is processed.
+    company_queue.put(_DONE)
+    for thread in enrich_workers:
+        thread.join()
+    org_queue.put(_DONE)
+    for thread in search_workers:
+        thread.join()
+    people_queue.put(_DONE)
+    verifier.join()
+    writer.close()
+    left = {domain for domain in queued if domain not in domains_done}
+    domains_done.close()
+    if not left:
+        os.remove(domains_path)
+    if left:
+        print(f"⚠️  {len(left)} companies weren't finished and will be retried on the next run.")
+        if unfinished is not None:
+            unfinished.update(left)
+
+    # STEP 4: Report on the output file
+    if writer.count:
+        print(f"\n✅ Wrote {writer.count} verified employees to {output_file}.")
         print("--- Script finished successfully! ---")
     else:
-        print("\n--- Script finished. No verified employees were found. ---")
+        print("\n--- Script finished. No new verified employees were found. ---")
+    return writer.count
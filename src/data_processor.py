@@ -1,4 +1,8 @@
 import json
+from . import config
+from .checkpoint import RecordWriter, read_records
+from .company_index import CompanyIndex, employee_count
+from .entity_resolution import resolve_entities
 
 def load_json_data(filepath):
     """Loads data from a JSON file."""
@@ -13,36 +17,73 @@ def load_json_data(filepath):
         print(f"Error: Could not decode JSON from '{filepath}'.")
         return None
 
-def filter_linkedin_data(companies, industry_filter, country_filter):
+def filter_linkedin_data(companies, industry_filter, country_filter, size_ranges=None):
     """
-    Filters a list of LinkedIn company data based on industry and country.
+    Filters LinkedIn company data based on industry and country.
+
+    `companies` can be any iterable, such as the generator returned by `read_records`,
+    so a large dump is filtered as it is read and only the matches are kept in memory.
     
     Args:
-        companies (list): A list of dictionaries, where each dictionary is a company's data.
-        industry_filter (str): The industry to filter by.
-        country_filter (str): The two-letter country code to filter by.
+        companies (iterable): Dictionaries, where each dictionary is a company's data.
+        industry_filter (str or list): The industry, or industries, to filter by.
+        country_filter (str or list): The two-letter country code, or codes, to filter by.
+        size_ranges (list, optional): (min, max) employee counts; either bound may be None.
         
     Returns:
         list: A new list containing only the companies that match the filters.
     """
+    industries = [industry_filter] if isinstance(industry_filter, str) else industry_filter
+    countries = [country_filter] if isinstance(country_filter, str) else country_filter
     filtered_companies = []
     
     for company in companies:
         if "industries" in company and "country_codes_array" in company:
             # The 'industries' field is a string, check if the filter is a substring
-            industries_match = industry_filter in company["industries"]
+            industries_match = any(industry in company["industries"] for industry in industries)
             # The 'country_codes_array' field is a list, check if the filter is in the list
-            country_match = country_filter in company["country_codes_array"]
+            country_match = any(country in company["country_codes_array"] for country in countries)
 
             if industries_match and country_match:
+                if size_ranges and not _in_size_ranges(employee_count(company), size_ranges):
+                    continue
                 filtered_companies.append(company)
 
     return filtered_companies
 
+def _in_size_ranges(count, size_ranges):
+    return any(
+        count >= (low or 0) and (high is None or count <= high)
+        for low, high in size_ranges
+    )
+
+def query_linkedin_data(filepath, industries, countries, size_ranges=None):
+    """
+    Filters a LinkedIn dump through its on-disk index instead of scanning every record.
+
+    The index is built on first use and cached next to the file, so later queries
+    against the same dump only read the matching records.
+
+    Args:
+        filepath (str): The path to the LinkedIn dump.
+        industries (list): Industry names; a company matches if any is a substring of its 'industries'.
+        countries (list): Two-letter country codes; a company matches if it has any of them.
+        size_ranges (list, optional): (min, max) employee counts; either bound may be None.
+
+    Returns:
+        list: The matching companies.
+    """
+    index = CompanyIndex.load_or_build(filepath)
+    return index.search(industries=industries, countries=countries, size_ranges=size_ranges)
+
 def merge_and_deduplicate(linkedin_data, places_data):
     """
     Merges two lists of company data and removes duplicates.
     Prioritizes LinkedIn data if a company exists in both lists.
+
+    Duplicates are found by `entity_resolution.resolve_entities`, which matches on
+    normalized domains, phone numbers and names, so "http://www.acme.com/" and
+    "acme.com/about" are recognised as the same company.
     
     Args:
         linkedin_data (list): A list of filtered company data from LinkedIn.
@@ -51,49 +92,65 @@ def merge_and_deduplicate(linkedin_data, places_data):
     Returns:
         list: The merged and deduplicated list of company data.
     """
-    # Create a dictionary for efficient lookup, using website as the key
-    merged_companies = {
-        company.get("website"): company
-        for company in linkedin_data if company.get("website")
-    }
-
-    # Iterate through the places data and merge or add
-    for place_company in places_data:
-        website = place_company.get("website")
-        if website and website in merged_companies:
-            # Company exists in both lists, keep the more comprehensive LinkedIn data
-            # but update with any missing fields from Google Places data if needed
-            linkedin_company = merged_companies[website]
-            for key, value in place_company.items():
-                if key not in linkedin_company:
-                    linkedin_company[key] = value
-        elif website:
-            # Company is unique to the Places data, so add it
-            merged_companies[website] = place_company
-        else:
-            # If no website is available, append the company from Places API to the final list,
-            # as we can't reliably deduplicate it.
-            merged_companies[place_company.get("name")] = place_company
+    # LinkedIn records come first, so each group's first record is the LinkedIn one when there is one.
+    companies = list(linkedin_data) + list(places_data)
+    merged_companies = []
+
+    for group in resolve_entities(companies):
+        # Keep the most comprehensive record and fill in any missing fields from its duplicates
+        primary = companies[group[0]]
+        for i in group[1:]:
+            for key, value in companies[i].items():
+                if key not in primary:
+                    primary[key] = value
+        merged_companies.append(primary)
 
-    return list(merged_companies.values())
+    return merged_companies
 
-def run_data_pipeline(linkedin_filepath, places_filepath, industry_to_find, country_to_find, output_filename):
+def run_data_pipeline(linkedin_filepath, places_filepath, industry_to_find, country_to_find, output_filename,
+                      size_ranges=None, places_data=None):
     """
     Runs the entire data processing pipeline: loads, filters, merges, and saves data.
+
+    `industry_to_find` and `country_to_find` may each be a single value or a list of
+    values, and `size_ranges` an optional list of (min, max) employee counts.
+
+    `places_data` may be given instead of `places_filepath`, e.g. as a stream of
+    records from a scraper that is still running. It is only read after the LinkedIn
+    data has been filtered, so the two overlap.
+
+    Returns:
+        int: The number of unique companies saved.
     """
+    industries = [industry_to_find] if isinstance(industry_to_find, str) else list(industry_to_find)
+    countries = [country_to_find] if isinstance(country_to_find, str) else list(country_to_find)
+
     # --- Step 1: Filter LinkedIn Data ---
     print("--- Step 1: Filtering LinkedIn data ---")
-    linkedin_raw_data = load_json_data(linkedin_filepath)
-    
-    if linkedin_raw_data:
-        filtered_linkedin_data = filter_linkedin_data(linkedin_raw_data, industry_to_find, country_to_find)
+    try:
+        if config.LINKEDIN_INDEX_ENABLED:
+            filtered_linkedin_data = query_linkedin_data(linkedin_filepath, industries, countries, size_ranges)
+        else:
+            # The dump is streamed (JSON list, NDJSON or gzip) and filtered as it is read.
+            filtered_linkedin_data = filter_linkedin_data(read_records(linkedin_filepath), industries, countries, size_ranges)
         print(f"Found {len(filtered_linkedin_data)} companies in LinkedIn data that match the criteria.")
-    else:
+    except FileNotFoundError:
+        print(f"Error: The file at '{linkedin_filepath}' was not found.")
+        filtered_linkedin_data = []
+    except json.JSONDecodeError:
+        print(f"Error: Could not decode JSON from '{linkedin_filepath}'.")
         filtered_linkedin_data = []
 
     # --- Step 2: Load Google Places Data ---
     print("\n--- Step 2: Loading Google Places data ---")
-    places_data = load_json_data(places_filepath)
+    try:
+        places_data = list(places_data if places_data is not None else read_records(places_filepath))
+    except FileNotFoundError:
+        print(f"Error: The file at '{places_filepath}' was not found.")
+        places_data = None
+    except json.JSONDecodeError:
+        print(f"Error: Could not decode JSON from '{places_filepath}'.")
+        places_data = None
     if places_data:
         print(f"Loaded {len(places_data)} companies from Google Places data.")
     else:
@@ -102,11 +159,13 @@ def run_data_pipeline(linkedin_filepath, places_filepath, industry_to_find, coun
     # --- Step 3: Merge and deduplicate the data ---
     print("\n--- Step 3: Merging and deduplicating data ---")
     final_merged_data = merge_and_deduplicate(filtered_linkedin_data, places_data)
+    print(f"Merged {len(filtered_linkedin_data) + len(places_data)} records into {len(final_merged_data)} unique companies.")
     
     # --- Step 4: Save the final result ---
     if final_merged_data:
-        with open(output_filename, "w") as f:
-            json.dump(final_merged_data, f, indent=4)
+        with RecordWriter(output_filename, atomic=True) as writer:
+            writer.write_many(final_merged_data)
         print(f"\n✅ Successfully saved {len(final_merged_data)} unique companies to '{output_filename}'.")
     else:
         print("\nNo data to save after merging.")
+    return len(final_merged_data)
@@ -1,5 +1,17 @@
-import neverbounce_sdk
-from . import config
+import re
+import time
+from . import config, http_client
+from .response_cache import get_cache
+
+# Loose syntax check; anything that passes is left for NeverBounce to judge.
+EMAIL_PATTERN = re.compile(r"^[A-Za-z0-9.!#$%&'*+/=?^_`{|}~-]+@[A-Za-z0-9-]+(\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}$")
+
+# Shared mailboxes that don't belong to a person, so they are never worth paying to verify.
+ROLE_BASED_PREFIXES = {
+    "admin", "billing", "careers", "contact", "enquiries", "hello", "help", "hr",
+    "info", "jobs", "marketing", "noreply", "no-reply", "office", "postmaster",
+    "sales", "support", "team", "webmaster",
+}
 
 def verify_email(email):
     """
@@ -14,12 +26,158 @@ def verify_email(email):
     if not email:
         return "not_provided"
     
-    # Initialize the NeverBounce client with the API key from config
-    nb_client = neverbounce_sdk.client(api_key=config.NEVERBOUNCE_API_KEY)
-    
+    # Results are cached by address, so re-runs don't pay for the same check twice
+    cache = get_cache()
+    hit, result = cache.get("neverbounce_email", {"email": email.lower()})
+    if hit:
+        return result
+
     try:
-        resp = nb_client.single_check(email)
-        return resp.get('result', 'verification_error')
+        resp = _neverbounce("GET", "single/check", params={"email": email})
+        result = resp.get('result', 'verification_error')
+        if result != 'verification_error':
+            cache.set("neverbounce_email", {"email": email.lower()}, result)
+        return result
     except Exception as e:
         print(f"    - NeverBounce Error for {email}: {e}")
         return "verification_error"
+
+def _neverbounce(method, path, params=None, json=None, retry=True):
+    """
+    Calls the NeverBounce v4 API through the shared HTTP client.
+
+    NeverBounce reports API errors in the body of a 200 response, so those are raised here.
+    `retry` is passed on to `http_client.request`.
+    """
+    url = f"{config.NEVERBOUNCE_BASE_URL}/{path}"
+    if json is not None:
+        json = {"key": config.NEVERBOUNCE_API_KEY, **json}
+    else:
+        params = {"key": config.NEVERBOUNCE_API_KEY, **(params or {})}
+    endpoint = "neverbounce_" + path.replace("/", "_")
+    data = http_client.request("neverbounce", method, url, endpoint=endpoint, params=params, json=json,
+                               retry=retry).json()
+    if data.get("status") != "success":
+        raise RuntimeError(f"{data.get('status')}: {data.get('message')}")
+    return data
+
+def prefilter_emails(emails):
+    """
+    Drops addresses that aren't worth sending to NeverBounce.
+
+    Args:
+        emails (iterable): Email addresses, possibly with duplicates and empty values.
+
+    Returns:
+        tuple: (to_verify, rejected) where `to_verify` is a list of unique, lower-cased
+               addresses and `rejected` maps each dropped address to the reason
+               ('invalid_syntax' or 'role_based'). Empty values are skipped.
+    """
+    to_verify = []
+    rejected = {}
+    seen = set()
+
+    for email in emails:
+        if not email:
+            continue
+        email = email.strip().lower()
+        if email in seen:
+            continue
+        seen.add(email)
+
+        if not EMAIL_PATTERN.match(email):
+            rejected[email] = "invalid_syntax"
+        elif email.split("@", 1)[0] in ROLE_BASED_PREFIXES:
+            rejected[email] = "role_based"
+        else:
+            to_verify.append(email)
+
+    return to_verify, rejected
+
+def _run_bulk_job(emails):
+    """
+    Submits one NeverBounce bulk job, waits for it to finish and collects its results.
+
+    Returns:
+        dict: A mapping of lower-cased email to verification result.
+    """
+    # Not retried: a timeout or 5xx may come after NeverBounce accepted the job, and a
+    # second submission would be billed again. The emails are retried on the next run instead.
+    job = _neverbounce("POST", "jobs/create", json={
+        "input_location": "supplied",
+        "input": [{"id": str(i), "email": email} for i, email in enumerate(emails)],
+        "auto_parse": 1,
+        "auto_start": 1,
+    }, retry=False)
+    job_id = job["job_id"]
+    print(f"📨 Submitted NeverBounce job {job_id} with {len(emails)} emails.")
+
+    deadline = time.monotonic() + config.NEVERBOUNCE_JOB_TIMEOUT
+    while True:
+        status = _neverbounce("GET", "jobs/status", params={"job_id": job_id})
+        job_status = status.get("job_status")
+        if job_status == "complete":
+            break
+        if job_status == "failed":
+            raise RuntimeError(f"NeverBounce job {job_id} failed: {status.get('failure_reason')}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"NeverBounce job {job_id} did not finish in time.")
+        time.sleep(config.NEVERBOUNCE_POLL_INTERVAL)
+
+    results = {}
+    page = 1
+    while True:
+        data = _neverbounce("GET", "jobs/results", params={"job_id": job_id, "page": page, "items_per_page": 1000})
+        for item in data.get("results", []):
+            email = item.get("data", {}).get("email", "").lower()
+            results[email] = item.get("verification", {}).get("result", "verification_error")
+        if page >= data.get("total_pages", 1):
+            return results
+        page += 1
+
+def verify_emails_bulk(emails):
+    """
+    Verifies many emails at once using NeverBounce bulk jobs.
+
+    Addresses are pre-filtered locally, cached results are reused, and only the
+    remaining addresses are submitted, in jobs of up to NEVERBOUNCE_BULK_JOB_SIZE.
+
+    Args:
+        emails (iterable): The email addresses to verify.
+
+    Returns:
+        dict: A mapping of lower-cased email to verification result. Pre-filtered
+              addresses map to the reason they were dropped.
+    """
+    to_verify, results = prefilter_emails(emails)
+    if results:
+        print(f"🧹 Dropped {len(results)} emails before verification (invalid syntax or role-based).")
+
+    cache = get_cache()
+    pending = []
+    for email in to_verify:
+        hit, result = cache.get("neverbounce_email", {"email": email})
+        if hit:
+            results[email] = result
+        else:
+            pending.append(email)
+
+    if not pending:
+        return results
+
+    batch_size = config.NEVERBOUNCE_BULK_JOB_SIZE
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        try:
+            job_results = _run_bulk_job(batch)
+        except Exception as e:
+            print(f"    - NeverBounce bulk job error: {e}")
+            job_results = {}
+
+        for email in batch:
+            result = job_results.get(email, "verification_error")
+            results[email] = result
+            if result != "verification_error":
+                cache.set("neverbounce_email", {"email": email}, result)
+
+    return results
@@ -0,0 +1,147 @@
+import json
+import sqlite3
+import threading
+import time
+from . import config, metrics
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+class EnrichmentLedger:
+    """
+    A persistent record of every domain, Apollo organization, person and email the
+    contact step has checked, when it was checked and what the result was, backed by SQLite.
+
+    Unlike the response cache, which is keyed by request, the ledger is keyed by the
+    thing being looked up, so a later run can tell which companies, people and
+    verifications are already known. An entry is fresh for its kind's window in
+    `freshness`; older entries are looked up again and overwritten.
+
+    Kinds used by the contact step:
+        domain: the Apollo organization ID for a company domain (None if Apollo doesn't know it).
+        organization: the IDs of the people found at an organization.
+        person: a person record from Apollo's people search.
+        email: an email's verification result.
+    """
+
+    def __init__(self, path, freshness=None):
+        self.path = path
+        self.freshness = freshness or {}
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        # Like the response cache, the ledger is shared by shard workers; the timeout waits out their writes.
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ledger ("
+            "kind TEXT, key TEXT, result TEXT, checked_at REAL, "
+            "PRIMARY KEY (kind, key))"
+        )
+        self._conn.commit()
+
+    def _count(self, kind, hits, misses):
+        if hits:
+            self.hits[kind] = self.hits.get(kind, 0) + hits
+            metrics.increment("ledger_hits_total", hits, kind=kind)
+        if misses:
+            self.misses[kind] = self.misses.get(kind, 0) + misses
+            metrics.increment("ledger_misses_total", misses, kind=kind)
+
+    def get(self, kind, key):
+        """
+        Looks up the last result recorded for an item.
+
+        Returns:
+            tuple: (fresh, result) where `fresh` is False if the item was never checked
+                   or was last checked longer ago than its kind's freshness window.
+        """
+        results = self.get_many(kind, [key])
+        if key in results:
+            return True, results[key]
+        return False, None
+
+    def get_many(self, kind, keys):
+        """
+        Looks up many items of one kind at once.
+
+        Returns:
+            dict: The fresh results, keyed by item. Missing and stale items are left out.
+        """
+        keys = list(dict.fromkeys(keys))
+        window = self.freshness.get(kind)
+        oldest = time.time() - window if window else None
+        results = {}
+        with self._lock:
+            # Chunked to stay under SQLite's limit on query parameters.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = self._conn.execute(
+                    f"SELECT key, result, checked_at FROM ledger WHERE kind = ? AND key IN ({placeholders})",
+                    (kind, *chunk)
+                ).fetchall()
+                for key, result, checked_at in rows:
+                    if oldest is None or checked_at > oldest:
+                        results[key] = json.loads(result)
+        self._count(kind, len(results), len(keys) - len(results))
+        return results
+
+    def record(self, kind, key, result):
+        """Records the result of checking an item, stamped with the current time."""
+        self.record_many(kind, {key: result})
+
+    def record_many(self, kind, results):
+        """Records many results of one kind in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ledger (kind, key, result, checked_at) VALUES (?, ?, ?, ?)",
+                [(kind, key, json.dumps(result), now) for key, result in results.items()]
+            )
+            self._conn.commit()
+
+    def stats(self):
+        """Returns the number of fresh and missing or stale lookups for each kind."""
+        kinds = sorted(set(self.hits) | set(self.misses))
+        return {
+            kind: {"fresh": self.hits.get(kind, 0), "checked": self.misses.get(kind, 0)}
+            for kind in kinds
+        }
+
+    def print_stats(self):
+        """Prints a short summary of how many items were reused and how many were checked."""
+        stats = self.stats()
+        if not stats:
+            return
+        print("\n📒 Enrichment ledger:")
+        for kind, counts in stats.items():
+            print(f"  - {kind}: {counts['fresh']} reused, {counts['checked']} new or stale")
+
+
+class NullLedger(EnrichmentLedger):
+    """A ledger that never remembers anything, used when the ledger is disabled."""
+
+    def __init__(self):
+        self.hits = {}
+        self.misses = {}
+
+    def get_many(self, kind, keys):
+        self._count(kind, 0, len(set(keys)))
+        return {}
+
+    def record_many(self, kind, results):
+        pass
+
+
+def get_ledger():
+    """Returns the process-wide enrichment ledger configured in src/config.py."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            if config.ENRICHMENT_LEDGER_ENABLED:
+                _ledger = EnrichmentLedger(config.enrichment_ledger_file, config.ENRICHMENT_FRESHNESS)
+            else:
+                _ledger = NullLedger()
+        return _ledger
@@ -0,0 +1,173 @@
+import re
+from difflib import SequenceMatcher
+from urllib.parse import urlparse
+
+# Websites on these hosts are shared by many businesses, so they say nothing about identity.
+SHARED_HOSTS = {
+    "facebook.com", "linkedin.com", "instagram.com", "twitter.com", "x.com",
+    "google.com", "sites.google.com", "business.site", "wixsite.com",
+    "blogspot.com", "wordpress.com", "linktr.ee", "youtube.com",
+}
+
+# Legal-form words dropped before names are compared.
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "ltd", "limited", "corp", "corporation",
+    "co", "company", "pvt", "private", "plc", "gmbh", "ag", "sa", "bv", "pty",
+}
+
+# Name blocks bigger than this are too generic to compare pairwise, so they are skipped.
+MAX_BLOCK_SIZE = 50
+NAME_SIMILARITY_THRESHOLD = 0.92
+PHONE_NAME_SIMILARITY_THRESHOLD = 0.6
+
+
+def normalize_domain(url):
+    """
+    Reduces a website to its bare domain, e.g. "https://www.Acme.com/about" -> "acme.com".
+
+    Returns:
+        str: The domain, or None if the value doesn't look like a website.
+    """
+    if not url or not isinstance(url, str):
+        return None
+    url = url.strip().lower()
+    if "://" not in url:
+        url = "http://" + url
+    try:
+        host = urlparse(url).hostname
+    except ValueError:
+        return None
+    if not host or "." not in host:
+        return None
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalize_phone(phone):
+    """Keeps only the digits of a phone number, dropping any country prefix beyond ten digits."""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", str(phone))
+    if len(digits) < 7:
+        return None
+    return digits[-10:]
+
+
+def normalize_name(name):
+    """Lower-cases a company name and drops punctuation and legal-form words like 'Inc.'."""
+    if not name:
+        return None
+    name = re.sub(r"['’]", "", str(name).lower())
+    tokens = re.findall(r"[a-z0-9]+", name)
+    tokens = [token for token in tokens if token not in LEGAL_SUFFIXES]
+    return " ".join(tokens) or None
+
+
+class _Groups:
+    """
+    A disjoint-set of records that also tracks the domains and phones seen in each group,
+    so two groups are never joined through a record that lacks the conflicting field.
+    """
+
+    def __init__(self, keys):
+        self.parent = list(range(len(keys)))
+        self.domains = [{key["domain"]} if key["domain"] else set() for key in keys]
+        self.phones = [{key["phone"]} if key["phone"] else set() for key in keys]
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def conflicts(self, a, b):
+        """True if the two groups have different real domains or different phones."""
+        a, b = self.find(a), self.find(b)
+        if self.domains[a] and self.domains[b] and not (self.domains[a] & self.domains[b]):
+            return True
+        if self.phones[a] and self.phones[b] and not (self.phones[a] & self.phones[b]):
+            return True
+        return False
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        # The lower index wins, so the first-seen record stays the group's representative.
+        if b < a:
+            a, b = b, a
+        self.parent[b] = a
+        self.domains[a] |= self.domains[b]
+        self.phones[a] |= self.phones[b]
+        self.domains[b] = self.phones[b] = None
+
+
+def _similar_names(a, b, threshold):
+    if not a or not b:
+        return True
+    return a == b or SequenceMatcher(None, a, b).ratio() >= threshold
+
+
+def resolve_entities(companies):
+    """
+    Groups records that refer to the same company.
+
+    Candidate pairs are found by blocking on normalized keys (domain, phone, exact
+    name and a short name prefix) rather than comparing every pair, so the work stays
+    close to linear in the number of records.
+
+    Matching rules:
+        - The same domain is the same company.
+        - The same normalized name, a near-identical name, or the same phone with a
+          similar name is the same company, unless that would put different domains
+          or different phones in one group.
+
+    Args:
+        companies (list): Company dictionaries with 'name', 'website' and 'phone' fields.
+
+    Returns:
+        list: Groups of indices into `companies`, each in input order, ordered by first appearance.
+    """
+    keys = []
+    for company in companies:
+        domain = normalize_domain(company.get("website"))
+        if domain and (domain in SHARED_HOSTS or any(domain.endswith("." + host) for host in SHARED_HOSTS)):
+            domain = None
+        keys.append({
+            "domain": domain,
+            "phone": normalize_phone(company.get("phone")),
+            "name": normalize_name(company.get("name")),
+        })
+
+    blocks = {}
+    for i, key in enumerate(keys):
+        if key["domain"]:
+            blocks.setdefault(("domain", key["domain"]), []).append(i)
+        if key["phone"]:
+            blocks.setdefault(("phone", key["phone"]), []).append(i)
+        if key["name"]:
+            blocks.setdefault(("name", key["name"]), []).append(i)
+            blocks.setdefault(("prefix", key["name"][:6]), []).append(i)
+
+    groups = _Groups(keys)
+    for (kind, _), members in blocks.items():
+        if len(members) < 2:
+            continue
+        if kind == "domain":
+            for i in members[1:]:
+                groups.union(members[0], i)
+            continue
+        if len(members) > MAX_BLOCK_SIZE:
+            continue
+        # Shared phones (e.g. business centres) only count when the names also look alike.
+        threshold = NAME_SIMILARITY_THRESHOLD if kind == "prefix" else PHONE_NAME_SIMILARITY_THRESHOLD
+        for pos, i in enumerate(members):
+            for j in members[pos + 1:]:
+                if kind != "name" and not _similar_names(keys[i]["name"], keys[j]["name"], threshold):
+                    continue
+                if not groups.conflicts(i, j):
+                    groups.union(i, j)
+
+    grouped = {}
+    for i in range(len(companies)):
+        grouped.setdefault(groups.find(i), []).append(i)
+    return list(grouped.values())
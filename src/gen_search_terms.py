@@ -1,9 +1,14 @@
-from typing import List, Dict, Any
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Dict, Any
 # from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.chat_models import ChatOllama
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, Field, ValidationError
 from . import config
+from .response_cache import get_cache
 
 class TargetGroupWithTerms(BaseModel):
     """Target group with rationale and search terms."""
@@ -17,39 +22,12 @@ class LeadPlan(BaseModel):
         description="A list of 5-10 target groups with rationale and Google Places search terms."
     )
 
-def generate_lead_generation_plan(product_description: str, model_name: str = "deepseek") -> List[Dict[str, Any]]:
-    """
-    Generate target groups and search terms for lead generation using an LLM.
-
-    Args:
-        product_description (str): A description of the product or service.
-        model_name (str): The name of the LLM model to use (e.g., "deepseek").
-
-    Returns:
-        List[Dict[str, Any]]: A list of dictionaries, where each dictionary
-                               contains the group name, rationale, and search terms.
-    """
-    if model_name == "deepseek":
-        print(f"🤖 Asking Ollama ({model_name}) to generate a detailed lead generation plan...")
-        llm = ChatOllama(model=model_name, base_url=config.OLLAMA_BASE_URL)
-    # else:
-    #     print(f"🤖 Asking Gemini ({model_name}) to generate a detailed lead generation plan...")
-    #     llm = ChatGoogleGenerativeAI(
-    #         model=model_name,
-    #         google_api_key=config.GEMINI_API_KEY,
-    #         convert_system_message_to_human=True
-    #     )
-
-    structured_llm = llm.with_structured_output(LeadPlan)
-
-    prompt = ChatPromptTemplate.from_messages([
-        ("system",
-        """You are an expert B2B lead generation strategist and market researcher. 
-        Your task is to analyze a product description, identify the most promising customer groups, 
-        justify why they are relevant, and generate highly-targeted search terms for Google Places. 
+SYSTEM_PROMPT = """You are an expert B2B lead generation strategist and market researcher.
+        Your task is to analyze a product description, identify the most promising customer groups,
+        justify why they are relevant, and generate highly-targeted search terms for Google Places.
 
         Follow these rules strictly:
-        - The rationale must be concise (2-3 sentences) and business-focused, 
+        - The rationale must be concise (2-3 sentences) and business-focused,
         explaining why this group is a high-potential customer segment.
         - Google Places search terms must be city-level or sub-region-specific (avoid broad regions like "USA" or "North America").
         - Prefer to include multiple relevant cities or hubs for each group. For example, instead of "fintech companies USA", generate terms like:
@@ -57,11 +35,11 @@ def generate_lead_generation_plan(product_description: str, model_name: str = "d
             "fintech companies in Noida", "fintech companies in Gurugram", "fintech companies in Delhi".
         - Provide 8-10 distinct Google Places search phrases per group to maximize coverage.
         - Do not add extra commentary, notes, or formatting outside of the required fields.
-        """),
-        ("human",
         """
-        Analyze the following product description and generate a lead generation plan 
-        containing 5-10 distinct target groups. 
+
+PLAN_PROMPT = """
+        Analyze the following product description and generate a lead generation plan
+        containing 5-10 distinct target groups.
 
         **Product Description:** "{product_description}"
 
@@ -73,7 +51,208 @@ def generate_lead_generation_plan(product_description: str, model_name: str = "d
         - Examples: "consulting firms in New York", "HR tech companies in San Francisco", "fintech companies in Austin".
 
         Return your final output in JSON strictly following the schema provided.
-        """)
+        """
+
+# The streaming prompt asks for one group per line, so each group can be used as soon as its line is complete.
+STREAM_PLAN_PROMPT = PLAN_PROMPT.replace(
+    "Return your final output in JSON strictly following the schema provided.",
+    """Return your final output as JSON Lines: one JSON object per target group, each on a single line,
+        with exactly the keys "group_name", "rationale" and "google_search_terms".
+        Do not wrap the lines in a list or a code block."""
+)
+
+REGENERATE_PROMPT = """
+        Generate ONE target group for the following product description.
+
+        **Product Description:** "{product_description}"
+
+        An earlier attempt produced this invalid output; use it as a starting point if it helps:
+        {broken_output}
+
+        The group must be different from these existing groups: {existing_groups}
+
+        Return group_name, rationale and 8-10 google_search_terms, strictly following the schema provided.
+        """
+
+def _get_llm(model_name: str):
+    if model_name == "deepseek":
+        return ChatOllama(model=model_name, base_url=config.OLLAMA_BASE_URL)
+    # else:
+    #     return ChatGoogleGenerativeAI(
+    #         model=model_name,
+    #         google_api_key=config.GEMINI_API_KEY,
+    #         convert_system_message_to_human=True
+    #     )
+    raise ValueError(f"Unsupported model: {model_name}")
+
+def _to_group(target: TargetGroupWithTerms) -> Dict[str, Any]:
+    return {
+        "group_name": target.group_name,
+        "rationale": target.rationale,
+        "google_search_terms": (target.google_search_terms or [])[:10]  # allow up to 10 terms
+    }
+
+def _plan_cache_params(product_description: str, model_name: str, streaming: bool) -> Dict[str, Any]:
+    """The cache key of a plan: the product description, model and a hash of the prompts used."""
+    prompts = [SYSTEM_PROMPT, STREAM_PLAN_PROMPT, REGENERATE_PROMPT] if streaming else [SYSTEM_PROMPT, PLAN_PROMPT]
+    return {
+        "product_description": product_description,
+        "model": model_name,
+        "prompt_hash": hashlib.sha256("\n".join(prompts).encode("utf-8")).hexdigest(),
+    }
+
+def _regenerate_group(llm, product_description: str, broken_output: str, existing_groups: List[str]):
+    """
+    Asks the LLM again for a single group whose streamed line could not be parsed or validated.
+
+    Returns:
+        Dict[str, Any]: The group, or None if every attempt failed.
+    """
+    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT), ("human", REGENERATE_PROMPT)])
+    chain = prompt | llm.with_structured_output(TargetGroupWithTerms)
+    for attempt in range(1 + config.LLM_GROUP_RETRIES):
+        try:
+            target = chain.invoke({
+                "product_description": product_description,
+                "broken_output": broken_output[:2000],
+                "existing_groups": ", ".join(existing_groups) or "none",
+            })
+            if target:
+                return _to_group(target)
+        except Exception as e:
+            print(f"⚠️ Regenerating a target group failed (attempt {attempt + 1}): {e}")
+    return None
+
+def stream_lead_generation_plan(product_description: str, model_name: str = "deepseek") -> Iterator[Dict[str, Any]]:
+    """
+    Generates target groups one at a time, yielding each as soon as the LLM has written it.
+
+    The LLM writes one JSON object per line. Each line is validated on its own, so a
+    malformed group doesn't discard the rest of the plan; it is regenerated in the
+    background while the stream carries on. Finished plans are cached by product
+    description, model and prompt, so an unchanged plan is returned immediately. A plan
+    with a group that couldn't be regenerated isn't cached.
+
+    Args:
+        product_description (str): A description of the product or service.
+        model_name (str): The name of the LLM model to use (e.g., "deepseek").
+
+    Yields:
+        Dict[str, Any]: One target group at a time, with its name, rationale and search terms.
+    """
+    cache = get_cache()
+    cache_params = _plan_cache_params(product_description, model_name, streaming=True)
+    hit, cached_plan = cache.get("llm_plan", cache_params)
+    if hit:
+        print(f"⏭️  Reusing the cached lead generation plan ({len(cached_plan)} target groups).")
+        yield from cached_plan
+        return
+
+    print(f"🤖 Asking Ollama ({model_name}) to stream a detailed lead generation plan...")
+    llm = _get_llm(model_name)
+    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT), ("human", STREAM_PLAN_PROMPT)])
+    chain = prompt | llm | StrOutputParser()
+
+    plan_list = []
+    seen_names = set()
+    failed = 0
+    missing = 0  # Invalid groups that couldn't be replaced
+
+    def accept(group):
+        key = group["group_name"].strip().lower()
+        if key in seen_names:
+            return False
+        seen_names.add(key)
+        plan_list.append(group)
+        return True
+
+    def parse_line(line):
+        """Returns the group on a line, None for lines that aren't groups, or raises if a group is invalid."""
+        line = line.strip().rstrip(",")
+        # Reasoning models may think aloud first; only lines that look like objects are groups.
+        if not line.startswith("{"):
+            return None
+        return _to_group(TargetGroupWithTerms.parse_obj(json.loads(line)))
+
+    with ThreadPoolExecutor(max_workers=config.LLM_REGENERATION_WORKERS) as pool:
+        retries = []
+
+        def handle(line):
+            nonlocal failed
+            try:
+                group = parse_line(line)
+            except (ValueError, ValidationError) as e:
+                failed += 1
+                print(f"⚠️ Invalid target group from the LLM, regenerating it: {e}")
+                retries.append(pool.submit(
+                    _regenerate_group, llm, product_description, line, [g["group_name"] for g in plan_list]
+                ))
+                return None
+            return group if group and accept(group) else None
+
+        buffer = ""
+        for chunk in chain.stream({"product_description": product_description}):
+            buffer += chunk
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                group = handle(line)
+                if group:
+                    yield group
+        group = handle(buffer)
+        if group:
+            yield group
+
+        for future in as_completed(retries):
+            group = future.result()
+            if group and accept(group):
+                yield group
+                continue
+            missing += 1
+            if group:
+                print(f"❌ The regenerated target group '{group['group_name']}' repeats another group; it is left out of the plan.")
+            else:
+                print("❌ Could not regenerate a target group; it is left out of the plan.")
+
+    print(f"✅ The LLM generated {len(plan_list)} target groups ({failed} regenerated).")
+    # A plan missing groups isn't cached, so the next run asks for the whole plan again.
+    if missing:
+        print(f"⚠️ {missing} target groups are missing from the plan; it won't be reused.")
+    elif plan_list:
+        cache.set("llm_plan", cache_params, plan_list)
+
+def generate_lead_generation_plan(product_description: str, model_name: str = "deepseek") -> List[Dict[str, Any]]:
+    """
+    Generate target groups and search terms for lead generation using an LLM.
+
+    With config.LLM_PLAN_STREAMING on, this collects `stream_lead_generation_plan`.
+    Otherwise the whole plan is requested as one structured response. Either way the
+    plan is cached, keyed by product description, model and prompt.
+
+    Args:
+        product_description (str): A description of the product or service.
+        model_name (str): The name of the LLM model to use (e.g., "deepseek").
+
+    Returns:
+        List[Dict[str, Any]]: A list of dictionaries, where each dictionary
+                               contains the group name, rationale, and search terms.
+    """
+    if config.LLM_PLAN_STREAMING:
+        return list(stream_lead_generation_plan(product_description, model_name))
+
+    cache = get_cache()
+    cache_params = _plan_cache_params(product_description, model_name, streaming=False)
+    hit, cached_plan = cache.get("llm_plan", cache_params)
+    if hit:
+        print(f"⏭️  Reusing the cached lead generation plan ({len(cached_plan)} target groups).")
+        return cached_plan
+
+    print(f"🤖 Asking Ollama ({model_name}) to generate a detailed lead generation plan...")
+    llm = _get_llm(model_name)
+    structured_llm = llm.with_structured_output(LeadPlan)
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("human", PLAN_PROMPT)
     ])
 
     chain = prompt | structured_llm
@@ -84,15 +263,9 @@ def generate_lead_generation_plan(product_description: str, model_name: str = "d
         print("❌ Schema validation failed:", e)
         return []
 
-    plan_list = []
-    for target in response_model.targets:
-        google_terms = (target.google_search_terms or [])[:10]  # allow up to 10 terms
-
-        plan_list.append({
-            "group_name": target.group_name,
-            "rationale": target.rationale,
-            "google_search_terms": google_terms
-        })
+    plan_list = [_to_group(target) for target in response_model.targets]
 
-    print(f"✅ Gemini generated {len(plan_list)} target groups.")
+    print(f"✅ The LLM generated {len(plan_list)} target groups.")
+    if plan_list:
+        cache.set("llm_plan", cache_params, plan_list)
     return plan_list
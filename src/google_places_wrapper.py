@@ -2,91 +2,333 @@ import requests
 import os
 import time
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote_plus
-from . import config
+from . import config, http_client
+from .http_client import get_session
+from .response_cache import get_cache
 
+DETAILS_FIELDS = "name,website,formatted_phone_number,rating"
 
-def scrape_google_places(search_term):
+
+def fetch_place_details(company, session=None):
     """
-    Scrapes Google Places using the Text Search API, handles pagination,
-    and fetches detailed information for each place.
-    
+    Fetches the Place Details for a single company found by the text search.
+
+    Args:
+        company (dict): A text search result with 'name', 'address' and 'place_id'.
+        session (requests.Session, optional): The pooled session to send the request on.
+
+    Returns:
+        dict: The full company record, or None if the details could not be fetched.
+    """
+    try:
+        return _fetch_place_details(company, session)
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Error fetching details: {e}")
+    return None
+
+
+def _fetch_place_details(company, session=None):
+    """Like `fetch_place_details`, but raises RequestException when the request fails."""
+    session = session or get_session()
+    place_id = company.get("place_id")
+    print(f"🔍 Fetching details for place ID: {place_id}...")
+    url = f"{config.GOOGLE_PLACES_BASE_URL}/details/json?place_id={place_id}&fields={DETAILS_FIELDS}&key={config.GOOGLE_PLACES_API_KEY}"
+
+    def fetch():
+        response = http_client.request("google_places", "GET", url, session=session, endpoint="places_details")
+        return response.json().get("result")
+
+    result = get_cache().cached("places_details", {"place_id": place_id, "fields": DETAILS_FIELDS}, fetch)
+    if result:
+        return {
+            "name": result.get("name"),
+            "address": company.get("address"),
+            "place_id": place_id,
+            "website": result.get("website"),
+            "phone": result.get("formatted_phone_number"),
+            "rating": result.get("rating")
+        }
+    return None
+
+
+def _fetch_search_page(session, url, page_token=None):
+    """
+    Fetches one page of Text Search results.
+
+    A next_page_token only becomes valid a short while after it is issued; until then
+    Google answers INVALID_REQUEST. Instead of sleeping a fixed 2 seconds, the request is
+    retried with a short, growing delay until the token works or PLACES_PAGE_TOKEN_TIMEOUT passes.
+    """
+    if page_token:
+        url += f"&pagetoken={page_token}"
+    deadline = time.monotonic() + config.PLACES_PAGE_TOKEN_TIMEOUT
+    delay = config.PLACES_PAGE_TOKEN_RETRY_DELAY
+
+    while True:
+        response = http_client.request("google_places", "GET", url, session=session, endpoint="places_textsearch")
+        data = response.json()
+        if page_token and data.get("status") == "INVALID_REQUEST" and time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 1.5, 1.0)
+            continue
+        return data
+
+
+def text_search(search_term, session=None, on_page=None, max_pages=None):
+    """
+    Runs the Text Search API for a term and returns the basic result of each place.
+
     Args:
         search_term (str): The search query, e.g., "tech startups in San Francisco".
-    
+        session (requests.Session, optional): The pooled session to send requests on.
+        on_page (callable, optional): Called with each page of results as soon as it arrives,
+            so callers can start on the details while the next page token becomes valid.
+        max_pages (int, optional): Maximum pages of 20 results to fetch (Google allows up to 3).
+            Defaults to config.PLACES_MAX_PAGES.
+
     Returns:
-        list: A list of dictionaries with all available data for each company.
+        list: Dictionaries with the 'name', 'address' and 'place_id' of each place.
+
+    Raises:
+        requests.exceptions.RequestException: If a search request fails.
     """
-    print(f"🌍 Scraping Google Places for: '{search_term}'...")
+    session = session or get_session()
+    max_pages = max_pages or config.PLACES_MAX_PAGES
     encoded_term = quote_plus(search_term)
-    
+    url = f"{config.GOOGLE_PLACES_BASE_URL}/textsearch/json?query={encoded_term}&key={config.GOOGLE_PLACES_API_KEY}"
+
     all_results = []
     next_page_token = None
-    
+
     # Loop to handle pagination, fetching up to 3 pages (60 results).
-    page_num = 1
-    for i in range(page_num):
-        url = f"https://maps.googleapis.com/maps/api/place/textsearch/json?query={encoded_term}&key={config.GOOGLE_PLACES_API_KEY}"
-        
-        if next_page_token:
-            url += f"&pagetoken={next_page_token}"
-            # A brief delay is required when using pagination to prevent a rate limit error.
-            time.sleep(2)
-        
+    for i in range(max_pages):
+        data = _fetch_search_page(session, url, next_page_token)
+
+        # Extract basic info and place_id from results
+        results = data.get("results", [])
+        page_results = [
+            {
+                "name": r.get("name"),
+                "address": r.get("formatted_address"),
+                "place_id": r.get("place_id")
+            }
+            for r in results
+        ]
+        all_results.extend(page_results)
+        if on_page and page_results:
+            on_page(page_results)
+
+        # Check for a next page token for pagination
+        next_page_token = data.get("next_page_token")
+        if not next_page_token:
+            break
+
+    return all_results
+
+
+def cached_text_search(search_term, session=None, on_page=None, max_pages=None):
+    """
+    Runs `text_search` through the response cache.
+
+    On a cache hit, `on_page` is called once with all of the cached results.
+    """
+    max_pages = max_pages or config.PLACES_MAX_PAGES
+    params = {"query": search_term, "max_pages": max_pages}
+    hit, all_results = get_cache().get("places_textsearch", params)
+    if hit:
+        if on_page and all_results:
+            on_page(all_results)
+        return all_results
+    all_results = text_search(search_term, session, on_page=on_page, max_pages=max_pages)
+    get_cache().set("places_textsearch", params, all_results)
+    return all_results
+
+
+def scrape_google_places(search_term, session=None, max_workers=None, skip_place_ids=None, on_record=None):
+    """
+    Scrapes Google Places using the Text Search API, handles pagination,
+    and fetches detailed information for each place.
+
+    Details for each page of results are fetched while the next page is still
+    being requested.
+
+    Args:
+        search_term (str): The search query, e.g., "tech startups in San Francisco".
+        session (requests.Session, optional): The pooled session to reuse across search terms.
+        max_workers (int, optional): Number of concurrent Place Details requests.
+        skip_place_ids (container, optional): Place IDs to leave out, e.g. ones saved by an earlier run.
+        on_record (callable, optional): Called with each company record as soon as it is fetched.
+
+    Returns:
+        list: A list of dictionaries with all available data for each company,
+              or None if the search request itself failed.
+    """
+    print(f"🌍 Scraping Google Places for: '{search_term}'...")
+    session = session or get_session()
+    max_workers = max_workers or config.PLACES_DETAILS_CONCURRENCY
+    skip_place_ids = skip_place_ids or ()
+
+    futures = []
+    seen = set()
+    complete_data = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def queue_details(page_results):
+            for company in page_results:
+                place_id = company.get("place_id")
+                if place_id and place_id not in skip_place_ids and place_id not in seen:
+                    seen.add(place_id)
+                    futures.append(executor.submit(fetch_place_details, company, session))
+
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract basic info and place_id from results
-            results = data.get("results", [])
-            for r in results:
-                all_results.append({
-                    "name": r.get("name"),
-                    "address": r.get("formatted_address"),
-                    "place_id": r.get("place_id")
-                })
-            
-            # Check for a next page token for pagination
-            next_page_token = data.get("next_page_token")
-            if not next_page_token:
-                break
-                
+            all_results = cached_text_search(search_term, session, on_page=queue_details)
         except requests.exceptions.RequestException as e:
             print(f"⚠️ Error from Google Places: {e}")
+            for future in futures:
+                future.cancel()
+            return None
+
+        if not all_results:
+            print("\nNo companies found from initial search.")
             return []
-            
-    if not all_results:
-        print("\nNo companies found from initial search.")
-        return []
 
-    print(f"\nFound {len(all_results)} companies. Fetching details...")
-    
+        print(f"\nFound {len(all_results)} companies. Fetching details...")
+
+        for future in futures:
+            record = future.result()
+            if record:
+                complete_data.append(record)
+                if on_record:
+                    on_record(record)
+
+    return complete_data
+
+
+def scrape_google_places_batch(search_terms, session=None, max_workers=None, term_workers=None,
+                               skip_place_ids=None, on_record=None, on_term_done=None, stream=False,
+                               on_update=None):
+    """
+    Scrapes many search terms concurrently, fetching each unique place only once.
+
+    Text searches run in parallel, and a place's details are requested as soon as the
+    first term that finds it returns. Places found by several terms are fetched once,
+    and every term that found a place is listed in its record's 'search_terms'.
+
+    `search_terms` may be a generator: each term is searched as soon as it is yielded,
+    so scraping can start while later terms are still being generated.
+
+    Args:
+        search_terms (iterable): The search queries.
+        session (requests.Session, optional): The pooled session shared by all requests.
+        max_workers (int, optional): Number of concurrent Place Details requests.
+            Defaults to config.PLACES_DETAILS_CONCURRENCY.
+        term_workers (int, optional): Number of concurrent text searches.
+            Defaults to config.PLACES_SEARCH_CONCURRENCY.
+        skip_place_ids (container, optional): Place IDs to leave out, e.g. ones saved by an earlier run.
+        on_record (callable, optional): Called with each company record once all searches are done.
+        on_term_done (callable, optional): Called with each search term whose search succeeded
+            and whose places' details were all fetched. A term with a place whose details
+            request failed is left out, so a rerun searches it again and retries that place.
+        stream (bool): Call `on_record` as soon as each record's details arrive instead of at the end.
+            A streamed record's 'search_terms' only lists the terms that had found it by then;
+            once all searches are done, the 'search_terms' of records that were found again are
+            completed in place and the records are passed to `on_update`.
+        on_update (callable, optional): Called with each streamed record whose 'search_terms' grew
+            after it was passed to `on_record`, so it can be saved again.
+
+    Returns:
+        list: One record per unique place, in the order the places were first found.
+    """
+    session = session or get_session()
+    max_workers = max_workers or config.PLACES_DETAILS_CONCURRENCY
+    term_workers = term_workers or config.PLACES_SEARCH_CONCURRENCY
+    skip_place_ids = skip_place_ids or ()
+    stream = stream and on_record is not None
+
+    places = {}  # place_id -> {"future": ..., "search_terms": [...]}
+    lock = threading.Lock()
     complete_data = []
-    
-    for company in all_results:
-        place_id = company.get("place_id")
-        if place_id:
-            print(f"🔍 Fetching details for place ID: {place_id}...")
-            url = f"https://maps.googleapis.com/maps/api/place/details/json?place_id={place_id}&fields=name,website,formatted_phone_number,rating&key={config.GOOGLE_PLACES_API_KEY}"
-            
+
+    with ThreadPoolExecutor(max_workers=max_workers) as details_pool, \
+            ThreadPoolExecutor(max_workers=term_workers) as search_pool:
+
+        def queue_details(term, page_results):
+            new_places = []
+            with lock:
+                for company in page_results:
+                    place_id = company.get("place_id")
+                    if not place_id or place_id in skip_place_ids:
+                        continue
+                    if place_id in places:
+                        if term not in places[place_id]["search_terms"]:
+                            places[place_id]["search_terms"].append(term)
+                        continue
+                    place = places[place_id] = {"search_terms": [term]}
+                    place["future"] = details_pool.submit(fetch_details, company, place)
+                    new_places.append(place)
+            # Outside the lock, since a callback runs right away if its details are already in.
+            if stream:
+                for place in new_places:
+                    place["future"].add_done_callback(lambda future, place=place: emit(place))
+
+        def fetch_details(company, place):
             try:
-                response = requests.get(url)
-                response.raise_for_status()
-                data = response.json()
-                result = data.get("result")
-                if result:
-                    full_record = {
-                        "name": result.get("name"),
-                        "address": company.get("address"),
-                        "place_id": place_id,
-                        "website": result.get("website"),
-                        "phone": result.get("formatted_phone_number"),
-                        "rating": result.get("rating")
-                    }
-                    complete_data.append(full_record)
-            
+                return _fetch_place_details(company, session)
             except requests.exceptions.RequestException as e:
                 print(f"⚠️ Error fetching details: {e}")
-                
+                place["failed"] = True
+                return None
+
+        def emit(place):
+            record = place["future"].result()
+            if record:
+                with lock:
+                    record["search_terms"] = list(place["search_terms"])
+                    place["emitted_terms"] = len(record["search_terms"])
+                on_record(record)
+
+        def search(term):
+            print(f"🌍 Scraping Google Places for: '{term}'...")
+            cached_text_search(term, session, on_page=lambda page: queue_details(term, page))
+
+        searches = {}
+        for term in search_terms:
+            if term not in searches:
+                searches[term] = search_pool.submit(search, term)
+        succeeded = []
+        for term, future in searches.items():
+            try:
+                future.result()
+                succeeded.append(term)
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️ Error from Google Places for '{term}': {e}")
+
+        print(f"\nFound {len(places)} unique companies across {len(searches)} search terms. Fetching details...")
+        for place in places.values():
+            record = place["future"].result()
+            if record:
+                if not stream:
+                    record["search_terms"] = place["search_terms"]
+                    if on_record:
+                        on_record(record)
+                complete_data.append(record)
+
+    if stream:
+        # Every search and every emit has finished, so the term lists are final.
+        for place in places.values():
+            record = place["future"].result()
+            if record and len(place["search_terms"]) > place.get("emitted_terms", 0):
+                record["search_terms"] = list(place["search_terms"])
+                if on_update:
+                    on_update(record)
+
+    if on_term_done:
+        # A place's terms are all left unfinished when its details failed, since any of them finds it again.
+        unresolved = {term for place in places.values() if place.get("failed") for term in place["search_terms"]}
+        for term in succeeded:
+            if term not in unresolved:
+                on_term_done(term)
     return complete_data
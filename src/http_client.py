@@ -0,0 +1,290 @@
+import random
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from . import config, metrics
+
+_session = None
+_session_lock = threading.Lock()
+_providers = {}
+_providers_lock = threading.Lock()
+
+# Status codes worth retrying: throttling and transient server errors.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of sending a request while a provider's circuit breaker is open."""
+
+
+def get_session():
+    """
+    Returns the pooled HTTP session shared by every API client in this process.
+
+    Reusing one session keeps TCP/TLS connections alive between calls instead of
+    opening a new connection for every request. Connections are pooled per host.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=10,
+                pool_maxsize=max(10, config.PLACES_DETAILS_CONCURRENCY, config.APOLLO_SEARCH_WORKERS)
+            )
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+class TokenBucket:
+    """
+    Limits a provider to a sustained request rate while allowing short bursts.
+
+    Tokens refill at `rate` per second up to `burst`; each request takes one.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks the calling thread until a token is available."""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket:
+    """
+    A token bucket kept in a SQLite file, so every process using the file shares one limit.
+
+    Used when the pipeline runs as several worker processes (config.SHARED_RATE_LIMITS),
+    so RATE_LIMITS apply to the whole run rather than to each worker. Refills are timed
+    with the wall clock, which is the only clock the processes have in common.
+    """
+
+    def __init__(self, name, rate, burst, path):
+        self.name = name
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._lock = threading.Lock()
+        # Autocommit mode, so the BEGIN IMMEDIATE below controls the transaction.
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _take(self):
+        """Takes a token if one is available. Returns how long to wait before trying again."""
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so no other process can take the same token.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens, updated = row if row else (float(self.capacity), now)
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                if not wait:
+                    tokens -= 1
+                self._conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (self.name, tokens, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self):
+        """Blocks the calling thread until a token is available."""
+        if not self.rate:
+            return
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after repeated failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests fail
+    fast for `reset_timeout` seconds. Then one trial request is let through; if it
+    succeeds the circuit closes again, otherwise it stays open for another period.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class Provider:
+    """The rate limiter and circuit breaker for one API provider."""
+
+    def __init__(self, name, settings):
+        self.name = name
+        rate, burst = settings.get("requests_per_second"), settings.get("burst", 1)
+        if config.SHARED_RATE_LIMITS and rate:
+            self.bucket = SharedTokenBucket(name, rate, burst, config.rate_limit_file)
+        else:
+            self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(
+            settings.get("failure_threshold", 5),
+            settings.get("reset_timeout", 30)
+        )
+
+
+def get_provider(name):
+    """Returns the shared rate limiter and circuit breaker for a provider configured in config.RATE_LIMITS."""
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = Provider(name, config.RATE_LIMITS.get(name, {}))
+        return _providers[name]
+
+
+def _retry_after(response):
+    """Reads a Retry-After header (seconds or an HTTP date) as a number of seconds."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(config.HTTP_BACKOFF_MAX, config.HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def request(provider, method, url, session=None, endpoint=None, retry=True, **kwargs):
+    """
+    Sends an HTTP request through the shared client.
+
+    The request waits for the provider's rate limit, fails fast while its circuit
+    breaker is open, and is retried with jittered exponential backoff on connection
+    errors, timeouts, 429 and 5xx responses, honouring Retry-After when present.
+    Latency, calls, retries and errors are recorded in `metrics` under `endpoint`.
+
+    Args:
+        provider (str): The provider name, a key of config.RATE_LIMITS (e.g. "apollo").
+        method (str): The HTTP method.
+        url (str): The URL.
+        session (requests.Session, optional): The session to send on. Defaults to the shared one.
+        endpoint (str, optional): The name calls are recorded under, e.g. "apollo_enrich".
+            Defaults to the provider and URL path.
+        retry (bool): Retry failures the server may already have acted on: read timeouts,
+            dropped connections and 5xx responses. Pass False for calls that mustn't be
+            repeated, such as submitting a paid job. 429 responses and connections that
+            were never made are retried either way.
+        **kwargs: Passed on to `requests.Session.request`.
+
+    Returns:
+        requests.Response: A successful response.
+
+    Raises:
+        requests.exceptions.RequestException: If the request still fails after all retries,
+            including HTTPError for error responses and CircuitOpenError.
+    """
+    session = session or get_session()
+    limits = get_provider(provider)
+    endpoint = endpoint or f"{provider}{urlparse(url).path}"
+    kwargs.setdefault("timeout", config.HTTP_TIMEOUT)
+
+    for attempt in range(config.HTTP_MAX_RETRIES + 1):
+        if attempt:
+            metrics.increment("http_retries_total", endpoint=endpoint)
+        if not limits.breaker.allow():
+            metrics.increment("http_errors_total", endpoint=endpoint, reason="circuit_open")
+            raise CircuitOpenError(f"Circuit breaker open for {provider}; skipping {url}")
+
+        wait_start = time.monotonic()
+        limits.bucket.acquire()
+        metrics.increment("rate_limit_wait_seconds_total", time.monotonic() - wait_start, provider=provider)
+
+        metrics.increment("http_requests_total", endpoint=endpoint)
+        start = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            metrics.observe_latency(endpoint, time.monotonic() - start)
+            limits.breaker.record_failure()
+            # A connect timeout means the request was never sent, so it is always safe to repeat.
+            if attempt == config.HTTP_MAX_RETRIES or not (retry or isinstance(e, requests.exceptions.ConnectTimeout)):
+                metrics.increment("http_errors_total", endpoint=endpoint, reason=type(e).__name__)
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        except requests.exceptions.RequestException as e:
+            limits.breaker.record_failure()
+            metrics.increment("http_errors_total", endpoint=endpoint, reason=type(e).__name__)
+            raise
+        metrics.observe_latency(endpoint, time.monotonic() - start)
+
+        if response.status_code in RETRY_STATUSES:
+            # Throttling means "slow down", not "down", so only server errors count towards the breaker.
+            if response.status_code == 429:
+                limits.breaker.record_success()
+            else:
+                limits.breaker.record_failure()
+            if attempt == config.HTTP_MAX_RETRIES or not (retry or response.status_code == 429):
+                metrics.increment("http_errors_total", endpoint=endpoint, reason=str(response.status_code))
+                response.raise_for_status()
+            delay = _retry_after(response)
+            time.sleep(min(delay, config.HTTP_RETRY_AFTER_MAX) if delay is not None else _backoff(attempt))
+            continue
+
+        # Other client errors are the caller's fault, not the provider's, so they don't trip the breaker.
+        limits.breaker.record_success()
+        if response.status_code >= 400:
+            metrics.increment("http_errors_total", endpoint=endpoint, reason=str(response.status_code))
+        response.raise_for_status()
+        return response
@@ -0,0 +1,174 @@
+import math
+from . import config
+from .checkpoint import RecordWriter, read_records
+from .company_index import employee_count, tokenize
+
+# Words that don't tell one industry or job title from another.
+STOP_WORDS = {"and", "of", "the", "for", "in", "&"}
+
+# The features SCORING_WEIGHTS can weigh.
+FEATURES = ("employee_count", "industry")
+
+# Marks a feature a company has no data for; it is left out of that company's score.
+UNKNOWN = None
+
+
+def _significant_tokens(text):
+    return [token for token in tokenize(text) if token not in STOP_WORDS]
+
+
+def employee_scores(counts, target_range):
+    """
+    Scores employee counts from 0 to 10 by how close they are to the target range.
+
+    A count inside the range scores 10, and the score falls by 10 for every factor
+    of ten the count is outside it, so a company half the minimum size scores 7.
+    Unknown counts (-1) score UNKNOWN.
+    """
+    low, high = target_range
+    low = low or 1
+    scores = []
+    for count in counts:
+        if count < 0:
+            scores.append(UNKNOWN)
+        elif count < low:
+            scores.append(max(0.0, 10 - 10 * math.log10(low / max(count, 1))))
+        elif high is not None and count > high:
+            scores.append(max(0.0, 10 - 10 * math.log10(count / high)))
+        else:
+            scores.append(10.0)
+    return scores
+
+
+def industry_scores(industries, target_industries):
+    """
+    Scores industry strings from 0 to 10 against the target industries.
+
+    An exact match scores 10; otherwise the score is the share of a target industry's
+    words found in the company's industry, using the best-matching target. Missing
+    industries score UNKNOWN.
+    """
+    targets = [set(_significant_tokens(target)) for target in target_industries]
+    targets = [target for target in targets if target]
+    exact = {industry.lower() for industry in target_industries}
+    scores = []
+    for industry in industries:
+        if not industry:
+            scores.append(UNKNOWN)
+        elif industry.lower() in exact:
+            scores.append(10.0)
+        else:
+            tokens = set(_significant_tokens(industry))
+            best = max((len(tokens & target) / len(target) for target in targets), default=0.0)
+            scores.append(10 * best)
+    return scores
+
+
+def score_companies(companies, target_industries, target_range=None, weights=None):
+    """
+    Computes a lead score from 0 to 10 for every company.
+
+    Each feature is scored for all companies at once, as a column, and the columns are
+    combined as a weighted average using `weights`. A feature a company has no data for
+    is left out of its average, so the score only reflects what is known about it.
+
+    Args:
+        companies (list): Merged company records.
+        target_industries (list): The industries being targeted.
+        target_range (tuple, optional): (min, max) ideal employee count; either bound may be None.
+            Defaults to config.SCORING_EMPLOYEE_RANGE.
+        weights (dict, optional): Weight per feature. Defaults to config.SCORING_WEIGHTS.
+
+    Returns:
+        list: The scores, in the same order as `companies`. A company with no data for any
+            weighted feature, such as a Google Places record without a LinkedIn match, scores None.
+    """
+    weights = weights or config.SCORING_WEIGHTS
+    target_range = target_range or config.SCORING_EMPLOYEE_RANGE
+    unknown = [feature for feature in weights if feature not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown scoring features: {', '.join(unknown)}")
+
+    features = {
+        "employee_count": lambda: employee_scores([employee_count(company) for company in companies], target_range),
+        "industry": lambda: industry_scores(
+            [company.get("industries") or company.get("industry") for company in companies], target_industries
+        ),
+    }
+    totals = [0.0] * len(companies)
+    known_weights = [0.0] * len(companies)
+    for feature, weight in weights.items():
+        for i, score in enumerate(features[feature]()):
+            if score is not UNKNOWN:
+                totals[i] += weight * score
+                known_weights[i] += weight
+    return [total / known if known else None for total, known in zip(totals, known_weights)]
+
+
+def rank_companies(companies, target_industries, threshold=None, target_range=None, weights=None,
+                   keep_unscored=None):
+    """
+    Scores companies and keeps those at or above the threshold, highest score first.
+
+    Companies with nothing to score them on are kept after every scored company, in their
+    original order, unless `keep_unscored` is False. Without a LinkedIn dump to merge with
+    that is every Google Places record, and dropping them would leave nothing to find contacts for.
+
+    Args:
+        keep_unscored (bool, optional): Defaults to config.SCORING_KEEP_UNSCORED.
+
+    Returns:
+        list: The kept companies, each with its 'lead_score' set (None for unscored companies).
+    """
+    threshold = config.LEAD_SCORE_THRESHOLD if threshold is None else threshold
+    keep_unscored = config.SCORING_KEEP_UNSCORED if keep_unscored is None else keep_unscored
+    scores = score_companies(companies, target_industries, target_range, weights)
+    ranked = sorted(
+        (i for i, score in enumerate(scores) if score is not None and score >= threshold),
+        key=lambda i: scores[i],
+        reverse=True
+    )
+    if keep_unscored:
+        ranked.extend(i for i, score in enumerate(scores) if score is None)
+    kept = []
+    for i in ranked:
+        company = companies[i]
+        company["lead_score"] = round(scores[i], 2) if scores[i] is not None else None
+        kept.append(company)
+    return kept
+
+
+def matches_persona(title, personas=None):
+    """
+    True if a job title matches one of the contact personas.
+
+    A title matches a persona when it contains all of the persona's significant words,
+    in any order, so "Sustainability Head" matches "Head of Sustainability". With no
+    personas configured every title matches.
+    """
+    personas = config.CONTACT_PERSONAS if personas is None else personas
+    if not personas:
+        return True
+    tokens = set(_significant_tokens(title))
+    return any(set(_significant_tokens(persona)) <= tokens for persona in personas)
+
+
+def run_scoring(input_file, output_file, target_industries, target_range=None):
+    """
+    Scores the merged companies and saves the ones worth finding contacts for, best first.
+
+    Returns:
+        int: The number of companies saved.
+    """
+    companies = list(read_records(input_file))
+    ranked = rank_companies(companies, target_industries, target_range=target_range)
+    unscored = sum(1 for company in ranked if company["lead_score"] is None)
+    print(f"Scored {len(companies)} companies; {len(ranked) - unscored} scored {config.LEAD_SCORE_THRESHOLD} or higher.")
+    if unscored:
+        print(f"Kept {unscored} companies with nothing to score them on, ranked after the scored ones.")
+
+    with RecordWriter(output_file, atomic=True) as writer:
+        writer.write_many(ranked)
+    if ranked:
+        print(f"✅ Saved {len(ranked)} ranked companies to '{output_file}'.")
+    return len(ranked)
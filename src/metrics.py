@@ -0,0 +1,249 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency histogram bucket upper bounds, in seconds.
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_histograms = {}  # endpoint -> Histogram
+_stages = {}  # stage name -> {"seconds": ..., "records": ..., "runs": ...}
+_started_at = time.time()
+
+
+class Histogram:
+    """A fixed-bucket latency histogram, like a Prometheus histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, data):
+        """Adds a histogram saved by `to_dict`, e.g. one from another process's report."""
+        for i, bound in enumerate(self.buckets + ["+Inf"]):
+            self.counts[i] += data["buckets"].get(str(bound), 0)
+        self.count += data["count"]
+        self.sum += data["sum_seconds"]
+        for name, pick in (("min", min), ("max", max)):
+            value = data[f"{name}_seconds"]
+            if value is not None:
+                current = getattr(self, name)
+                setattr(self, name, value if current is None else pick(current, value))
+
+    def quantile(self, q):
+        """Estimates a quantile from the buckets (the upper bound of the bucket it falls in)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [self.max], self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum, 6),
+            "mean_seconds": round(self.sum / self.count, 6) if self.count else None,
+            "min_seconds": self.min,
+            "max_seconds": self.max,
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95),
+            "p99_seconds": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ["+Inf"], self.counts)},
+        }
+
+
+def increment(name, amount=1, **labels):
+    """Adds to a counter, e.g. increment("http_requests_total", endpoint="apollo_enrich")."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe_latency(endpoint, seconds):
+    """Records the latency of one call to an endpoint."""
+    with _lock:
+        if endpoint not in _histograms:
+            _histograms[endpoint] = Histogram()
+        _histograms[endpoint].observe(seconds)
+
+
+class StageTimer:
+    """Handed out by `stage()`; set `records` to the number of records the stage produced."""
+
+    def __init__(self):
+        self.records = 0
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a pipeline stage.
+
+    Usage:
+        with metrics.stage("scrape_google_places") as timer:
+            timer.records = scrape(...)
+    """
+    timer = StageTimer()
+    start = time.monotonic()
+    try:
+        yield timer
+    finally:
+        elapsed = time.monotonic() - start
+        with _lock:
+            totals = _stages.setdefault(name, {"seconds": 0.0, "records": 0, "runs": 0})
+            totals["seconds"] += elapsed
+            totals["records"] += timer.records or 0
+            totals["runs"] += 1
+
+
+def report(cost_per_call=None):
+    """
+    Builds a machine-readable summary of everything recorded so far.
+
+    Args:
+        cost_per_call (dict, optional): Price of one call per endpoint, used to estimate API spend.
+
+    Returns:
+        dict: Stage timings and throughput, per-endpoint latency, and all counters.
+    """
+    with _lock:
+        counters = {}
+        for (name, labels), value in sorted(_counters.items()):
+            counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+
+        stages = {
+            name: {
+                **totals,
+                "seconds": round(totals["seconds"], 3),
+                "records_per_second": round(totals["records"] / totals["seconds"], 3) if totals["seconds"] else None,
+            }
+            for name, totals in _stages.items()
+        }
+
+        endpoints = {endpoint: histogram.to_dict() for endpoint, histogram in sorted(_histograms.items())}
+
+    result = {
+        "started_at": _started_at,
+        "finished_at": time.time(),
+        "stages": stages,
+        "endpoints": endpoints,
+        "counters": counters,
+    }
+
+    if cost_per_call:
+        calls = {
+            entry["labels"].get("endpoint"): entry["value"]
+            for entry in counters.get("http_requests_total", [])
+        }
+        costs = {endpoint: calls.get(endpoint, 0) * price for endpoint, price in cost_per_call.items()}
+        result["estimated_cost"] = {"by_endpoint": costs, "total": round(sum(costs.values()), 4)}
+
+    return result
+
+
+def merge_report(data, stage_suffix=""):
+    """
+    Adds the counters, latency histograms and stage timings of a report written by another
+    process, such as a shard worker, to this process's metrics.
+
+    Args:
+        data (dict): The report, as returned by `report`.
+        stage_suffix (str): Appended to the report's stage names, e.g. " (shard 2)", so they are
+            listed next to this process's own timings rather than added to them.
+    """
+    with _lock:
+        for name, entries in data.get("counters", {}).items():
+            for entry in entries:
+                key = (name, tuple(sorted(entry["labels"].items())))
+                _counters[key] = _counters.get(key, 0) + entry["value"]
+        for endpoint, histogram in data.get("endpoints", {}).items():
+            if endpoint not in _histograms:
+                _histograms[endpoint] = Histogram()
+            _histograms[endpoint].merge(histogram)
+        for name, totals in data.get("stages", {}).items():
+            merged = _stages.setdefault(name + stage_suffix, {"seconds": 0.0, "records": 0, "runs": 0})
+            for field in ("seconds", "records", "runs"):
+                merged[field] += totals[field]
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    parts = ",".join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+    return "{" + parts + "}"
+
+
+def prometheus_text():
+    """Renders the counters, latency histograms and stage timings in the Prometheus text format."""
+    lines = []
+    with _lock:
+        names = sorted({name for name, _ in _counters})
+        for name in names:
+            lines.append(f"# TYPE {name} counter")
+            for (counter_name, labels), value in sorted(_counters.items()):
+                if counter_name == name:
+                    lines.append(f"{name}{_prometheus_labels(dict(labels))} {value}")
+
+        if _histograms:
+            lines.append("# TYPE http_request_duration_seconds histogram")
+        for endpoint, histogram in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ["+Inf"], histogram.counts):
+                cumulative += count
+                labels = _prometheus_labels({"endpoint": endpoint, "le": bound})
+                lines.append(f"http_request_duration_seconds_bucket{labels} {cumulative}")
+            labels = _prometheus_labels({"endpoint": endpoint})
+            lines.append(f"http_request_duration_seconds_sum{labels} {histogram.sum}")
+            lines.append(f"http_request_duration_seconds_count{labels} {histogram.count}")
+
+        if _stages:
+            lines.append("# TYPE pipeline_stage_seconds gauge")
+            for name, totals in sorted(_stages.items()):
+                lines.append(f"pipeline_stage_seconds{_prometheus_labels({'stage': name})} {totals['seconds']}")
+            lines.append("# TYPE pipeline_stage_records gauge")
+            for name, totals in sorted(_stages.items()):
+                lines.append(f"pipeline_stage_records{_prometheus_labels({'stage': name})} {totals['records']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_report(filepath, prometheus_filepath=None, cost_per_call=None):
+    """Writes the JSON run report and, optionally, a Prometheus text dump."""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(report(cost_per_call), f, indent=4)
+    print(f"\n📊 Run report written to '{filepath}'.")
+    if prometheus_filepath:
+        with open(prometheus_filepath, 'w', encoding='utf-8') as f:
+            f.write(prometheus_text())
+        print(f"📊 Prometheus metrics written to '{prometheus_filepath}'.")
+
+
+def reset():
+    """Clears everything recorded so far."""
+    global _started_at
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _stages.clear()
+        _started_at = time.time()
@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from . import metrics
+from .checkpoint import atomic_output, read_records
+
+_DONE = object()  # Marks the end of a stage's record stream
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Returns the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Args:
+        name (str): The stage's name, used to refer to it from other stages.
+        run (callable): Called with a `StageContext`. It may emit records for downstream
+            stages, and may return the number of records it produced.
+        inputs (list, optional): External files the stage reads, e.g. the LinkedIn dump.
+        outputs (list, optional): Files the stage writes. When the stage is skipped, the
+            records in its first output are replayed to the stages that stream from it.
+        after (list, optional): Stages that must finish before this one starts.
+        streams (list, optional): Stages whose records this one consumes while they are
+            still running, via `StageContext.stream`.
+        params (dict, optional): Settings that change the stage's result, e.g. filters.
+            Changing them makes the stage run again.
+        skip_unchanged (bool): Skip the stage when its inputs haven't changed. Turn this off
+            for stages whose result also depends on something else, e.g. how old cached data is.
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), after=(), streams=(), params=None,
+                 skip_unchanged=True):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)
+        self.streams = list(streams)
+        self.params = params or {}
+        self.skip_unchanged = skip_unchanged
+
+    @property
+    def upstream(self):
+        return self.after + self.streams
+
+    def replay(self):
+        """The records this stage produced last time, read back from its first output."""
+        if self.outputs and os.path.exists(self.outputs[0]):
+            yield from read_records(self.outputs[0])
+
+
+class _Channel:
+    """Delivers a stage's records to every stage that streams from it."""
+
+    def __init__(self):
+        self._queues = []
+
+    def subscribe(self):
+        q = queue.Queue()
+        self._queues.append(q)
+        return q
+
+    def put(self, record):
+        for q in self._queues:
+            q.put(record)
+
+    def close(self):
+        for q in self._queues:
+            q.put(_DONE)
+
+
+class StageContext:
+    """What a running stage sees: the records of its upstream stages and a way to emit its own."""
+
+    def __init__(self, stage, channel, subscriptions):
+        self.stage = stage
+        self.emitted = 0
+        self.unfinished = None
+        self._channel = channel
+        self._subscriptions = subscriptions
+
+    def emit(self, record):
+        """Passes a record to the stages that stream from this one."""
+        self.emitted += 1
+        if self._channel:
+            self._channel.put(record)
+
+    def incomplete(self, reason):
+        """
+        Reports that the stage left work for a later run, e.g. keys its checkpoint
+        doesn't have yet. The stage isn't recorded as up to date, so it runs again.
+        """
+        self.unfinished = reason
+
+    def stream(self, name):
+        """Yields an upstream stage's records as they are produced, until it finishes."""
+        q = self._subscriptions[name]
+        while True:
+            record = q.get()
+            if record is _DONE:
+                return
+            yield record
+
+
+class Pipeline:
+    """
+    Runs a graph of stages.
+
+    Every stage runs on its own thread. A stage starts once the stages it runs `after`
+    have finished, while stages it `streams` from may still be running, so downstream
+    work overlaps with upstream work instead of waiting for it.
+
+    A stage is skipped when neither its params nor the contents of its inputs and its
+    upstream stages' outputs have changed since it last finished. The fingerprints
+    are kept in `state_file`. A stage that reports unfinished work through
+    `StageContext.incomplete` isn't fingerprinted, so the next run retries it.
+    """
+
+    def __init__(self, stages, state_file):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = state_file
+        self._state = self._load_state()
+        self._lock = threading.Lock()
+        for stage in stages:
+            missing = [name for name in stage.upstream if name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {', '.join(missing)}")
+
+    def _load_state(self):
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError):
+                pass
+        return {"files": {}, "stages": {}}
+
+    def _save_state(self):
+        with atomic_output(self.state_file) as temp_file:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, indent=4)
+
+    def _file_hash(self, path):
+        """Hashes a file, reusing the saved hash while its size and modification time are unchanged."""
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        with self._lock:
+            known = self._state["files"].get(path)
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+            return known["sha256"]
+        digest = file_digest(path)
+        with self._lock:
+            self._state["files"][path] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest}
+        return digest
+
+    def _fingerprint(self, stage):
+        parts = {
+            "params": stage.params,
+            "inputs": {path: self._file_hash(path) for path in stage.inputs},
+            "upstream": {
+                name: {path: self._file_hash(path) for path in self.stages[name].outputs}
+                for name in stage.upstream
+            },
+        }
+        encoded = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _up_to_date(self, stage, statuses):
+        if not stage.skip_unchanged:
+            return False
+        # A running stage's outputs aren't final yet, so anything streaming from it has to run too.
+        # Stages this one runs `after` have finished, so their outputs are simply compared by hash.
+        if any(statuses[name] not in ("skipped", "disabled") for name in stage.streams):
+            return False
+        if not all(os.path.exists(path) for path in stage.outputs):
+            return False
+        saved = self._state["stages"].get(stage.name, {})
+        return saved.get("fingerprint") == self._fingerprint(stage)
+
+    def run(self, enabled=None, force=False):
+        """
+        Runs the pipeline.
+
+        Args:
+            enabled (container, optional): Names of the stages to run. Disabled stages are
+                not run, but their existing outputs are still passed downstream.
+                Defaults to every stage.
+            force (bool): Run every enabled stage even if its inputs haven't changed.
+
+        Returns:
+            dict: Each stage's final status: "ran", "incomplete", "skipped", "disabled" or "failed".
+                An incomplete stage's output is still passed downstream.
+        """
+        enabled = set(self.stages) if enabled is None else set(enabled)
+        channels = {name: _Channel() for name in self.stages}
+        subscriptions = {
+            name: {upstream: channels[upstream].subscribe() for upstream in stage.streams}
+            for name, stage in self.stages.items()
+        }
+        # A stage's status is set before its `decided` event, and it is final once `finished` is set.
+        statuses = {}
+        decided = {name: threading.Event() for name in self.stages}
+        finished = {name: threading.Event() for name in self.stages}
+
+        def replay(stage, channel):
+            for record in stage.replay():
+                channel.put(record)
+
+        def run_stage(name):
+            stage = self.stages[name]
+            channel = channels[name]
+            try:
+                for upstream in stage.after:
+                    finished[upstream].wait()
+                for upstream in stage.streams:
+                    decided[upstream].wait()
+
+                failed = [upstream for upstream in stage.upstream if statuses[upstream] == "failed"]
+                if name not in enabled:
+                    statuses[name] = "disabled"
+                    decided[name].set()
+                    replay(stage, channel)
+                    return
+                if failed:
+                    print(f"⏭️  Not running '{name}' because {', '.join(failed)} failed.")
+                    statuses[name] = "failed"
+                    decided[name].set()
+                    return
+                if not force and self._up_to_date(stage, statuses):
+                    print(f"⏭️  Skipping '{name}': its inputs haven't changed since the last run.")
+                    statuses[name] = "skipped"
+                    decided[name].set()
+                    replay(stage, channel)
+                    return
+
+                statuses[name] = "ran"
+                decided[name].set()
+                print(f"\n--- Running stage '{name}' ---")
+                context = StageContext(stage, channel, subscriptions[name])
+                with metrics.stage(name) as timer:
+                    produced = stage.run(context)
+                    timer.records = produced if produced is not None else context.emitted
+
+                # The fingerprint covers upstream outputs, so it can only be taken once they are final.
+                for upstream in stage.upstream:
+                    finished[upstream].wait()
+                if any(statuses[upstream] == "failed" for upstream in stage.upstream):
+                    statuses[name] = "failed"
+                    return
+                if context.unfinished:
+                    print(f"⚠️  Stage '{name}' left work unfinished ({context.unfinished}); it will run again next time.")
+                    statuses[name] = "incomplete"
+                    with self._lock:
+                        self._state["stages"].pop(name, None)
+                        self._save_state()
+                    return
+                fingerprint = self._fingerprint(stage)
+                for path in stage.outputs:
+                    self._file_hash(path)
+                with self._lock:
+                    self._state["stages"][name] = {"fingerprint": fingerprint, "finished_at": time.time()}
+                    self._save_state()
+            except Exception as e:
+                print(f"❌ Stage '{name}' failed: {e}")
+                statuses[name] = "failed"
+            finally:
+                statuses.setdefault(name, "failed")
+                decided[name].set()
+                channel.close()
+                finished[name].set()
+
+        threads = [threading.Thread(target=run_stage, args=(name,), name=f"stage-{name}") for name in self.stages]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+import sqlite3
+import textwrap
+import threading
+import zlib
+from .entity_resolution import normalize_domain
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+STORE_EXTENSIONS = (".sqlite", ".db")
+
+# Fields a store can be keyed by, and how each is read from a record.
+KEY_FIELDS = {
+    "place_id": lambda record: record.get("place_id"),
+    "domain": lambda record: normalize_domain(record.get("website")) or normalize_domain(record.get("domain")),
+    "apollo_org_id": lambda record: record.get("apollo_org_id") or record.get("organization_id"),
+    "email": lambda record: (record.get("email") or "").strip().lower() or None,
+}
+
+# Records are compressed together in blocks of this many; a bigger block compresses
+# better but makes updating one record in it slower.
+BLOCK_RECORDS = 1000
+
+
+def is_store_path(filepath):
+    """True if the path names a record store, by its extension or, for existing files, its header."""
+    if filepath.endswith(STORE_EXTENSIONS):
+        return True
+    if os.path.exists(filepath):
+        with open(filepath, 'rb') as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    return False
+
+
+def _pack(records):
+    return zlib.compress(json.dumps(records, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def _key_hash(value):
+    # Stored instead of the key itself, which would take more room than the compressed records.
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+class RecordStore:
+    """
+    A SQLite file of records, compressed in blocks and optionally keyed by one field.
+
+    New records are saved one by one to a small uncompressed tail, so nothing written
+    is lost in a crash. Every BLOCK_RECORDS records the tail is packed into one
+    zlib-compressed JSON block. Records of the same kind repeat the same field names
+    and similar values, so compressing them together makes a store several times
+    smaller than the same records as NDJSON, and reading a block is a single json.loads.
+    `checkpoint.read_records` and `checkpoint.RecordWriter` read and write stores
+    transparently, so stages don't need to know which format their files are in.
+
+    Args:
+        path (str): The store file.
+        key (str, optional): The field that identifies a record, one of KEY_FIELDS, e.g.
+            "place_id". With a key, writing a record that is already stored updates it in
+            place instead of adding a duplicate, and records can be looked up with `get`.
+            The key is saved in the store, so it only needs to be given when the store is created.
+    """
+
+    def __init__(self, path, key=None):
+        if key is not None and key not in KEY_FIELDS:
+            raise ValueError(f"Unknown key '{key}'; expected one of {', '.join(KEY_FIELDS)}")
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS blocks (id INTEGER PRIMARY KEY, count INTEGER NOT NULL, data BLOB NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS tail (id INTEGER PRIMARY KEY, key TEXT, data TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tail_key ON tail(key) WHERE key IS NOT NULL")
+        # The blocks holding each packed key, by a hash of the key. Two keys can share a hash,
+        # so a lookup checks every block listed for it.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keys (hash INTEGER NOT NULL, block INTEGER NOT NULL, PRIMARY KEY (hash, block)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        saved = self._conn.execute("SELECT value FROM meta WHERE name = 'key'").fetchone()
+        if key and not saved:
+            self._conn.execute("INSERT INTO meta VALUES ('key', ?)", (key,))
+        self.key = key or (saved[0] if saved else None)
+        self._conn.commit()
+
+    def _key_of(self, record):
+        return KEY_FIELDS[self.key](record) if self.key else None
+
+    def _find_packed(self, value, blocks):
+        """
+        Finds the packed record with a key value.
+
+        Returns:
+            tuple: (block id, position in the block), or None. Blocks read along the way
+                are kept in `blocks`, by id.
+        """
+        for (block_id,) in self._conn.execute("SELECT block FROM keys WHERE hash = ?", (_key_hash(value),)).fetchall():
+            if block_id not in blocks:
+                data = self._conn.execute("SELECT data FROM blocks WHERE id = ?", (block_id,)).fetchone()[0]
+                blocks[block_id] = _unpack(data)
+            for i, stored in enumerate(blocks[block_id]):
+                if self._key_of(stored) == value:
+                    return block_id, i
+        return None
+
+    def _upsert_many(self, records):
+        blocks = {}  # block id -> its records, for the blocks read by this call
+        changed = set()
+        added = []  # (key, record) of the new records, appended together at the end
+        added_keys = {}
+        for record in records:
+            value = self._key_of(record)
+            if value is None:
+                added.append((value, record))
+                continue
+            # Fields from the new record win; fields it doesn't have are kept.
+            if value in added_keys:
+                i = added_keys[value]
+                added[i] = (value, {**added[i][1], **record})
+                continue
+            row = self._conn.execute("SELECT id, data FROM tail WHERE key = ? LIMIT 1", (value,)).fetchone()
+            if row:
+                merged = {**json.loads(row[1]), **record}
+                self._conn.execute("UPDATE tail SET data = ? WHERE id = ?", (self._encode(merged), row[0]))
+                continue
+            found = self._find_packed(value, blocks)
+            if not found:
+                added_keys[value] = len(added)
+                added.append((value, record))
+                continue
+            block_id, i = found
+            blocks[block_id][i] = {**blocks[block_id][i], **record}
+            changed.add(block_id)
+        for block_id in changed:
+            self._conn.execute("UPDATE blocks SET data = ? WHERE id = ?", (_pack(blocks[block_id]), block_id))
+        self._append(added)
+
+    @staticmethod
+    def _encode(record):
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+    def _append(self, added):
+        """Adds new records after the tail, packing every full block of BLOCK_RECORDS."""
+        if not added:
+            return
+        tail_size = self._conn.execute("SELECT COUNT(*) FROM tail").fetchone()[0]
+        if tail_size + len(added) < BLOCK_RECORDS:
+            self._conn.executemany(
+                "INSERT INTO tail (key, data) VALUES (?, ?)", [(value, self._encode(record)) for value, record in added]
+            )
+            return
+        rows = [(value, json.loads(data)) for value, data in self._conn.execute("SELECT key, data FROM tail ORDER BY id")]
+        rows.extend(added)
+        self._conn.execute("DELETE FROM tail")
+        full = len(rows) - len(rows) % BLOCK_RECORDS
+        for start in range(0, full, BLOCK_RECORDS):
+            self._write_block(rows[start:start + BLOCK_RECORDS])
+        self._conn.executemany(
+            "INSERT INTO tail (key, data) VALUES (?, ?)", [(value, self._encode(record)) for value, record in rows[full:]]
+        )
+
+    def _write_block(self, rows):
+        block_id = self._conn.execute(
+            "INSERT INTO blocks (count, data) VALUES (?, ?)", (len(rows), _pack([record for _, record in rows]))
+        ).lastrowid
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO keys VALUES (?, ?)",
+            [(_key_hash(value), block_id) for value, _ in rows if value is not None]
+        )
+
+    def _pack_tail(self):
+        rows = [(value, json.loads(data)) for value, data in self._conn.execute("SELECT key, data FROM tail ORDER BY id")]
+        if rows:
+            self._write_block(rows)
+            self._conn.execute("DELETE FROM tail")
+
+    def upsert(self, record):
+        """Adds a record, or updates the stored record with the same key."""
+        self.upsert_many([record])
+
+    def upsert_many(self, records):
+        """Adds or updates many records in one transaction."""
+        with self._lock:
+            self._upsert_many(records)
+            self._conn.commit()
+
+    def get(self, value):
+        """Returns the record stored under a key value, or None."""
+        if not self.key:
+            return None
+        # Normalized the way stored keys are, so "ACME.com" finds acme.com.
+        value = self._key_of({self.key: value})
+        if value is None:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM tail WHERE key = ? LIMIT 1", (value,)).fetchone()
+            if row:
+                return json.loads(row[0])
+            blocks = {}
+            found = self._find_packed(value, blocks)
+        if not found:
+            return None
+        block_id, i = found
+        return blocks[block_id][i]
+
+    def __contains__(self, value):
+        """True if a record with this key value is stored."""
+        return self.get(value) is not None
+
+    def __len__(self):
+        with self._lock:
+            packed = self._conn.execute("SELECT COALESCE(SUM(count), 0) FROM blocks").fetchone()[0]
+            return packed + self._conn.execute("SELECT COUNT(*) FROM tail").fetchone()[0]
+
+    def __iter__(self):
+        """Yields every record in the order it was first stored, one block at a time."""
+        last_id = 0
+        while True:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT id, data FROM blocks WHERE id > ? ORDER BY id LIMIT 1", (last_id,)
+                ).fetchone()
+            if not row:
+                break
+            yield from _unpack(row[1])
+            last_id = row[0]
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM tail ORDER BY id").fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def clear(self):
+        """Deletes every record."""
+        with self._lock:
+            for table in ("blocks", "tail", "keys"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def export_json(self, filepath, ndjson=False):
+        """
+        Writes every record to a JSON file, for tools that expect the old format.
+
+        Args:
+            filepath (str): The file to write.
+            ndjson (bool): Write one record per line instead of an indented JSON list.
+
+        Returns:
+            int: The number of records written.
+        """
+        count = 0
+        with open(filepath, 'w', encoding='utf-8') as f:
+            if not ndjson:
+                f.write("[")
+            for record in self:
+                if ndjson:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                else:
+                    f.write(("," if count else "") + "\n" + textwrap.indent(json.dumps(record, ensure_ascii=False, indent=4), "    "))
+                count += 1
+            if not ndjson:
+                f.write("\n]\n")
+        return count
+
+    def close(self):
+        with self._lock:
+            # A store that is only read has nothing new to pack.
+            if self._conn.execute("SELECT COUNT(*) FROM tail").fetchone()[0]:
+                self._pack_tail()
+                self._conn.commit()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a record store to JSON.")
+    parser.add_argument("store", help="The .sqlite store to export.")
+    parser.add_argument("output", help="The JSON file to write.")
+    parser.add_argument("--ndjson", action="store_true", help="Write one record per line instead of a JSON list.")
+    args = parser.parse_args()
+    with RecordStore(args.store) as store:
+        count = store.export_json(args.output, ndjson=args.ndjson)
+    print(f"✅ Exported {count} records to '{args.output}'.")
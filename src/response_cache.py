@@ -0,0 +1,176 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from . import config, metrics
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def make_key(namespace, params):
+    """
+    Builds a stable cache key from an endpoint namespace and its request parameters.
+
+    Parameters are normalized first (dict keys sorted, strings stripped) so that
+    cosmetically different requests share the same entry. Case-insensitive values such
+    as domains and emails should be lower-cased by the caller.
+    """
+    def normalize(value):
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+
+    payload = json.dumps(normalize(params), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class ResponseCache:
+    """
+    A persistent, size-bounded cache for API responses, backed by SQLite.
+
+    Entries expire after a per-namespace TTL and, once the cache holds more than
+    `max_entries`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, ttls=None, max_entries=100000):
+        self.path = path
+        self.ttls = ttls or {}
+        self.max_entries = max_entries
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        # Shard workers share this file, so wait on their writes instead of failing.
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, namespace TEXT, value TEXT, "
+            "expires_at REAL, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON responses(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, namespace, params):
+        """
+        Looks up a cached response.
+
+        Returns:
+            tuple: (hit, value) where `hit` is False if the entry is missing or expired.
+        """
+        key = make_key(namespace, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and (row[1] is None or row[1] > now):
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits[namespace] = self.hits.get(namespace, 0) + 1
+                metrics.increment("cache_hits_total", namespace=namespace)
+                return True, json.loads(row[0])
+            self.misses[namespace] = self.misses.get(namespace, 0) + 1
+            metrics.increment("cache_misses_total", namespace=namespace)
+            return False, None
+
+    def set(self, namespace, params, value):
+        """Stores a response, evicting the least recently used entries if the cache is full."""
+        key = make_key(namespace, params)
+        now = time.time()
+        ttl = self.ttls.get(namespace)
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            existed = self._conn.execute(
+                "SELECT 1 FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, namespace, value, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, json.dumps(value), expires_at, now)
+            )
+            if not existed:
+                self._size += 1
+            if self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops expired entries, then the least recently used ones, to stay under max_entries."""
+        self._conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = self._size - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            self._size -= overflow
+
+    def cached(self, namespace, params, fetch):
+        """
+        Returns the cached response for the request, calling `fetch()` on a miss.
+
+        Responses that are None are not cached, and exceptions raised by `fetch`
+        propagate without storing anything, so failed calls are retried next run.
+        """
+        hit, value = self.get(namespace, params)
+        if hit:
+            return value
+        value = fetch()
+        if value is not None:
+            self.set(namespace, params, value)
+        return value
+
+    def stats(self):
+        """Returns the hit and miss counts for each namespace."""
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        return {
+            ns: {"hits": self.hits.get(ns, 0), "misses": self.misses.get(ns, 0)}
+            for ns in namespaces
+        }
+
+    def print_stats(self):
+        """Prints a short summary of cache hits and misses per endpoint."""
+        stats = self.stats()
+        if not stats:
+            return
+        print("\n📦 API response cache:")
+        for ns, counts in stats.items():
+            print(f"  - {ns}: {counts['hits']} hits, {counts['misses']} misses")
+
+
+class NullCache(ResponseCache):
+    """A cache that never stores anything, used when caching is disabled."""
+
+    def __init__(self):
+        self.hits = {}
+        self.misses = {}
+
+    def get(self, namespace, params):
+        self.misses[namespace] = self.misses.get(namespace, 0) + 1
+        metrics.increment("cache_misses_total", namespace=namespace)
+        return False, None
+
+    def set(self, namespace, params, value):
+        pass
+
+
+def get_cache():
+    """Returns the process-wide response cache configured in src/config.py."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if config.CACHE_ENABLED:
+                _cache = ResponseCache(config.cache_file, config.CACHE_TTLS, config.CACHE_MAX_ENTRIES)
+            else:
+                _cache = NullCache()
+        return _cache
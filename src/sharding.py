@@ -0,0 +1,139 @@
+import hashlib
+import os
+import subprocess
+import sys
+import threading
+from .checkpoint import RecordWriter, read_records
+
+
+def shard_of(key, count):
+    """
+    Returns the shard a key belongs to, out of `count` shards.
+
+    The hash is stable across processes and machines (unlike Python's hash()), so every
+    worker agrees on which shard owns a search term or domain.
+    """
+    digest = hashlib.sha1(str(key).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+class Shard:
+    """One shard of a sharded run: worker `index` of `count`."""
+
+    def __init__(self, index, count):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index}/{count}; expected 0 <= index < count")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, value):
+        """Parses a shard written as "index/count", e.g. "2/8"."""
+        index, sep, count = value.partition("/")
+        if not sep:
+            raise ValueError(f"Invalid shard '{value}'; expected index/count, e.g. 2/8")
+        return cls(int(index), int(count))
+
+    def owns(self, key):
+        """True if this shard is responsible for the key."""
+        return shard_of(key, self.count) == self.index
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+
+def shard_dir(base_dir, index):
+    """The directory a shard's outputs, checkpoints and state are kept in."""
+    return os.path.join(base_dir, "shards", str(index))
+
+
+def run_workers(commands):
+    """
+    Runs one worker process per command and waits for all of them.
+
+    Each worker's output is printed with its shard number in front, so interleaved
+    logs stay readable.
+
+    Args:
+        commands (list): The argv of each worker, indexed by shard.
+
+    Returns:
+        dict: The exit status of each worker that didn't exit cleanly, by index.
+    """
+    def relay(index, process):
+        for line in process.stdout:
+            print(f"[shard {index}] {line}", end="")
+
+    processes = []
+    relays = []
+    for index, command in enumerate(commands):
+        process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8"
+        )
+        relay_thread = threading.Thread(target=relay, args=(index, process), daemon=True)
+        relay_thread.start()
+        processes.append(process)
+        relays.append(relay_thread)
+
+    exit_codes = {}
+    for index, (process, relay_thread) in enumerate(zip(processes, relays)):
+        code = process.wait()
+        if code != 0:
+            exit_codes[index] = code
+        relay_thread.join()
+    return exit_codes
+
+
+def python_command(script, args):
+    """The argv that runs a Python script with the current interpreter."""
+    return [sys.executable, script, *args]
+
+
+def _record_key(record, key):
+    value = record.get(key)
+    if key == "email" and value:
+        value = value.strip().lower()
+    return value
+
+
+def reduce_outputs(shard_files, output_file, key):
+    """
+    Merges the shards' outputs into one file, keeping the first record for each key.
+
+    A place found by search terms in several shards keeps its first record, with the
+    'search_terms' of every shard's copy merged into it. Shards are read in index order
+    and each file in its own order, so the same shard outputs always give the same result.
+
+    Args:
+        shard_files (list): Each shard's output file, indexed by shard. Missing files are skipped.
+        output_file (str): The merged file to write.
+        key (str): The field that identifies a record, e.g. "place_id".
+
+    Returns:
+        int: The number of records written.
+    """
+    shard_files = [path for path in shard_files if os.path.exists(path)]
+
+    # A first pass collects each place's terms, so records can be written in one go afterwards.
+    search_terms = {}
+    if key == "place_id":
+        for path in shard_files:
+            for record in read_records(path):
+                value = record.get(key)
+                if value:
+                    terms = search_terms.setdefault(value, [])
+                    terms.extend(term for term in record.get("search_terms") or [] if term not in terms)
+
+    seen = set()
+    with RecordWriter(output_file, key=key, atomic=True) as writer:
+        for path in shard_files:
+            for record in read_records(path):
+                value = _record_key(record, key)
+                if value:
+                    if value in seen:
+                        continue
+                    seen.add(value)
+                    if value in search_terms:
+                        record["search_terms"] = search_terms[value]
+                writer.write(record)
+    return writer.count
@@ -0,0 +1,78 @@
+import gzip
+import io
+import json
+import os
+import pytest
+from src.checkpoint import RecordWriter, _iter_json_array, read_records, update_records
+
+
+@pytest.mark.parametrize("name", ["out.ndjson", "out.sqlite"])
+def test_atomic_writer_replaces_the_file_when_closed(tmp_path, name):
+    path = str(tmp_path / name)
+    with RecordWriter(path, atomic=True) as writer:
+        writer.write({"place_id": "old"})
+
+    with RecordWriter(path, atomic=True) as writer:
+        writer.write({"place_id": "new"})
+        assert [record["place_id"] for record in read_records(path)] == ["old"]
+    assert [record["place_id"] for record in read_records(path)] == ["new"]
+
+
+@pytest.mark.parametrize("name", ["out.ndjson", "out.sqlite"])
+def test_atomic_writer_keeps_the_old_file_on_errors(tmp_path, name):
+    path = str(tmp_path / name)
+    with RecordWriter(path, atomic=True) as writer:
+        writer.write({"place_id": "old"})
+
+    with pytest.raises(RuntimeError):
+        with RecordWriter(path, atomic=True) as writer:
+            writer.write({"place_id": "new"})
+            raise RuntimeError("crashed")
+    assert [record["place_id"] for record in read_records(path)] == ["old"]
+    assert sorted(os.listdir(tmp_path)) == [name]
+
+
+def test_update_records_rewrites_ndjson_in_place(tmp_path):
+    path = str(tmp_path / "places.ndjson")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps({"place_id": f"p{i}", "search_terms": ["a"]}) + "\n" for i in range(3))
+
+    update_records(path, [{"place_id": "p1", "search_terms": ["a", "b"]}], key="place_id")
+    assert [record["search_terms"] for record in read_records(path)] == [["a"], ["a", "b"], ["a"]]
+
+
+DUMP = [
+    {"name": "Acme, Inc. [HQ]", "industries": "Retail", "country_codes_array": ["IN", "US"]},
+    {"name": "Zürich Solar", "employees_in_linkedin": 12345, "nested": {"list": [1, 2, [3]], "empty": {}}},
+    123456789,
+    "a string with , and ] in it",
+    [],
+    None,
+]
+
+
+def test_json_list_parser_handles_every_chunk_boundary():
+    text = " \n" + json.dumps(DUMP, indent=2, ensure_ascii=False) + "\n"
+    # Every chunk size up to the whole text puts a boundary inside every token at least once.
+    for chunk_size in range(1, len(text) + 2):
+        assert list(_iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == DUMP, chunk_size
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ ]  ", "[\n]\n"])
+def test_json_list_parser_reads_empty_lists(text):
+    for chunk_size in (1, 2, 1 << 20):
+        assert list(_iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == []
+
+
+@pytest.mark.parametrize("text", ['[{"a": 1}, {"b": ', '[{"a": 1}'])
+def test_json_list_parser_rejects_truncated_input(text):
+    for chunk_size in (1, 3, 1 << 20):
+        with pytest.raises(json.JSONDecodeError):
+            list(_iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+
+def test_read_records_streams_gzip_json_lists(tmp_path):
+    path = str(tmp_path / "dump.json.gz")
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(DUMP[:2], f, indent=4, ensure_ascii=False)
+    assert list(read_records(path)) == DUMP[:2]
@@ -0,0 +1,58 @@
+import json
+import os
+import pytest
+from src.company_index import CompanyIndex
+
+COMPANIES = [
+    {"name": "Acme", "industries": "Renewable Energy", "country_codes_array": ["IN"], "employees_in_linkedin": 120},
+    {"name": "Globex", "industries": "Retail", "country_codes_array": ["US"], "company_size": "1,001-5,000 employees"},
+    {"name": "Initech", "industries": "Renewable Energy Semiconductor", "country_codes_array": ["US", "IN"]},
+]
+
+
+def write_dump(path, ndjson):
+    with open(path, 'w', encoding='utf-8') as f:
+        if ndjson:
+            f.writelines(json.dumps(company) + "\n" for company in COMPANIES)
+        else:
+            json.dump(COMPANIES, f)
+
+
+@pytest.mark.parametrize("name", ["dump.ndjson", "dump.json"])
+def test_saved_index_gives_the_same_results(tmp_path, name):
+    path = str(tmp_path / name)
+    write_dump(path, ndjson=name.endswith(".ndjson"))
+    built = CompanyIndex.build(path)
+    loaded = CompanyIndex._load(path)
+
+    assert loaded is not None
+    assert sorted(os.listdir(CompanyIndex.index_dir(path))) == sorted(
+        ["index.json", "postings.bin"] + ([] if name.endswith(".ndjson") else ["records.ndjson"])
+    )
+    for query in [
+        {"industries": ["Renewable Energy"], "countries": ["IN"]},
+        {"countries": ["US"], "size_ranges": [(1000, None)]},
+    ]:
+        assert loaded.search(**query) == built.search(**query)
+    assert [company["name"] for company in loaded.search(industries=["Renewable Energy"], countries=["IN"])] == [
+        "Acme", "Initech"
+    ]
+
+
+def test_index_is_rebuilt_when_the_source_changes(tmp_path):
+    path = str(tmp_path / "dump.ndjson")
+    write_dump(path, ndjson=True)
+    CompanyIndex.build(path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"name": "Hooli", "industries": "Retail", "country_codes_array": ["IN"]}) + "\n")
+
+    assert CompanyIndex._load(path) is None
+    names = [company["name"] for company in CompanyIndex.load_or_build(path).search(countries=["IN"])]
+    assert names == ["Acme", "Initech", "Hooli"]
+
+
+def test_missing_dump_leaves_nothing_behind(tmp_path):
+    path = str(tmp_path / "missing.json")
+    with pytest.raises(FileNotFoundError):
+        CompanyIndex.load_or_build(path)
+    assert os.listdir(tmp_path) == []
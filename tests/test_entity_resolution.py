@@ -0,0 +1,71 @@
+import pytest
+from src.data_processor import merge_and_deduplicate
+from src.entity_resolution import normalize_domain, normalize_name, normalize_phone, resolve_entities
+
+
+@pytest.mark.parametrize("url", ["http://www.acme.com/", "https://acme.com", "acme.com/about", " HTTPS://WWW.Acme.com?x=1 "])
+def test_websites_reduce_to_the_same_domain(url):
+    assert normalize_domain(url) == "acme.com"
+
+
+@pytest.mark.parametrize("url", [None, "", "not a website", 42])
+def test_non_websites_have_no_domain(url):
+    assert normalize_domain(url) is None
+
+
+def test_phone_and_name_normalization():
+    assert normalize_phone("+91 (22) 5555-0100") == normalize_phone("022 5555 0100")[-10:] == "2255550100"
+    assert normalize_phone("12-34") is None
+    assert normalize_name("Acme, Inc.") == normalize_name("ACME Inc") == "acme"
+
+
+def test_the_requests_examples_are_one_company():
+    companies = [
+        {"name": "Acme", "website": "http://www.acme.com/"},
+        {"name": "Acme Corporation", "website": "https://acme.com"},
+        {"name": "ACME Ltd", "website": "acme.com/about"},
+    ]
+    assert resolve_entities(companies) == [[0, 1, 2]]
+
+
+def test_shared_hosts_are_not_identity():
+    companies = [
+        {"name": "Blue Bakery", "website": "https://facebook.com/bluebakery"},
+        {"name": "Green Garage", "website": "https://www.facebook.com/greengarage"},
+    ]
+    assert resolve_entities(companies) == [[0], [1]]
+
+
+def test_companies_without_websites_match_by_name_or_phone():
+    companies = [
+        {"name": "Globex Corporation"},
+        {"name": "Globex Corp."},
+        {"name": "Globex Industries Pvt Ltd", "phone": "+1 555 0100 200"},
+        {"name": "Globex Industries", "phone": "555-0100-200"},
+        {"name": "Initech"},
+    ]
+    assert resolve_entities(companies) == [[0, 1], [2, 3], [4]]
+
+
+def test_same_name_with_different_domains_stays_apart():
+    companies = [
+        {"name": "Acme", "website": "acme.com"},
+        {"name": "Acme", "website": "acme.de"},
+        {"name": "Acme"},
+    ]
+    # The record without a website joins the first group it matches; the two domains never meet.
+    assert resolve_entities(companies) == [[0, 2], [1]]
+
+
+def test_merge_keeps_the_linkedin_record_and_fills_in_gaps():
+    linkedin = [{"name": "Acme Corp", "website": "https://www.acme.com", "industries": "Retail"}]
+    places = [
+        {"name": "Acme", "website": "acme.com/about", "phone": "+1 555 0100", "place_id": "p1"},
+        {"name": "Initech", "website": "initech.com", "place_id": "p2"},
+    ]
+    merged = merge_and_deduplicate(linkedin, places)
+    assert merged == [
+        {"name": "Acme Corp", "website": "https://www.acme.com", "industries": "Retail",
+         "phone": "+1 555 0100", "place_id": "p1"},
+        {"name": "Initech", "website": "initech.com", "place_id": "p2"},
+    ]
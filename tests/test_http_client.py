@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from src import config, http_client
+
+
+class StubServer:
+    """
+    A local HTTP server that answers with scripted responses, in order.
+
+    Each response is a (status, headers) pair; once the script runs out, the last
+    response is repeated. Every request received is counted.
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests += 1
+                status, headers = stub.responses[min(stub.requests, len(stub.responses)) - 1]
+                body = json.dumps({"status": status}).encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        host, port = self._server.server_address[:2]
+        self.url = f"http://{host}:{port}/check"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    # A fresh provider for every test, so breaker state doesn't leak between them.
+    monkeypatch.setattr(http_client, "_providers", {})
+    monkeypatch.setattr(config, "RATE_LIMITS", {"stub": {"failure_threshold": 2, "reset_timeout": 0.3}})
+    monkeypatch.setattr(config, "HTTP_MAX_RETRIES", 2)
+    monkeypatch.setattr(config, "HTTP_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(config, "HTTP_TIMEOUT", 5)
+    servers = []
+
+    def start(*responses):
+        servers.append(StubServer(*responses))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def get(server, **kwargs):
+    with requests.Session() as session:
+        return http_client.request("stub", "GET", server.url, session=session, **kwargs)
+
+
+def test_429_waits_for_retry_after(stub):
+    server = stub((429, {"Retry-After": "0.3"}), (200, {}))
+    start = time.monotonic()
+    assert get(server).status_code == 200
+    assert time.monotonic() - start >= 0.3
+    assert server.requests == 2
+    # Throttling isn't a failure, so the breaker stays closed.
+    assert http_client.get_provider("stub").breaker.failures == 0
+
+
+def test_429_is_retried_even_without_retry(stub):
+    server = stub((429, {"Retry-After": "0"}), (200, {}))
+    assert get(server, retry=False).status_code == 200
+    assert server.requests == 2
+
+
+def test_5xx_is_retried(stub):
+    server = stub((503, {}), (200, {}))
+    assert get(server).status_code == 200
+    assert server.requests == 2
+
+
+def test_5xx_is_not_resent_without_retry(stub):
+    server = stub((503, {}), (200, {}))
+    with pytest.raises(requests.exceptions.HTTPError):
+        get(server, retry=False)
+    assert server.requests == 1
+
+
+def test_breaker_opens_then_lets_one_trial_through(stub, monkeypatch):
+    monkeypatch.setattr(config, "HTTP_MAX_RETRIES", 0)
+    server = stub((503, {}), (503, {}), (200, {}))
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            get(server)
+
+    # Open: requests fail without reaching the server.
+    with pytest.raises(http_client.CircuitOpenError):
+        get(server)
+    assert server.requests == 2
+
+    # After reset_timeout one trial goes through, and its success closes the breaker.
+    time.sleep(0.35)
+    assert get(server).status_code == 200
+    assert get(server).status_code == 200
+    assert server.requests == 4
+
+
+def test_failed_trial_keeps_the_breaker_open(stub, monkeypatch):
+    monkeypatch.setattr(config, "HTTP_MAX_RETRIES", 0)
+    server = stub((503, {}))
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            get(server)
+
+    time.sleep(0.35)
+    with pytest.raises(requests.exceptions.HTTPError):
+        get(server)
+    with pytest.raises(http_client.CircuitOpenError):
+        get(server)
+    assert server.requests == 3
+
+
+def test_breaker_lets_only_one_trial_through_at_a_time():
+    breaker = http_client.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
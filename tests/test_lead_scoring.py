@@ -0,0 +1,32 @@
+from src.lead_scoring import rank_companies, score_companies
+
+TARGETS = ["Renewable Energy"]
+
+
+def test_missing_fields_are_left_out_of_the_score():
+    companies = [
+        {"industries": "Renewable Energy", "employees_in_linkedin": 200},
+        {"industries": "Retail", "employees_in_linkedin": 200},
+        {"employees_in_linkedin": 300},
+        {"name": "Places only"},
+    ]
+    assert score_companies(companies, TARGETS) == [10.0, 5.0, 10.0, None]
+
+
+def test_unscored_companies_are_kept_after_scored_ones():
+    companies = [
+        {"name": "Places only", "website": "https://acme.com"},
+        {"name": "Retail", "industries": "Retail", "employees_in_linkedin": 5},
+        {"name": "Solar", "industries": "Renewable Energy", "employees_in_linkedin": 200},
+    ]
+    ranked = rank_companies(companies, TARGETS, threshold=7.0)
+    assert [(company["name"], company["lead_score"]) for company in ranked] == [
+        ("Solar", 10.0),
+        ("Places only", None),
+    ]
+
+
+def test_unscored_companies_can_be_dropped():
+    companies = [{"name": "Places only"}, {"name": "Solar", "industries": "Renewable Energy"}]
+    ranked = rank_companies(companies, TARGETS, threshold=7.0, keep_unscored=False)
+    assert [company["name"] for company in ranked] == ["Solar"]
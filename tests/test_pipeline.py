@@ -0,0 +1,49 @@
+import json
+from src.pipeline import Pipeline, Stage
+
+
+def make_stage(path, runs, unfinished=None):
+    def run(ctx):
+        runs.append(1)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([{"id": 1}], f)
+        if unfinished:
+            ctx.incomplete(unfinished)
+        return 1
+    return Stage("work", run, outputs=[path])
+
+
+def test_unchanged_stage_is_skipped(tmp_path):
+    output, state = str(tmp_path / "out.json"), str(tmp_path / "state.json")
+    runs = []
+    assert Pipeline([make_stage(output, runs)], state).run() == {"work": "ran"}
+    assert Pipeline([make_stage(output, runs)], state).run() == {"work": "skipped"}
+    assert len(runs) == 1
+
+
+def test_incomplete_stage_runs_again(tmp_path):
+    output, state = str(tmp_path / "out.json"), str(tmp_path / "state.json")
+    runs = []
+    assert Pipeline([make_stage(output, runs, unfinished="2 domains")], state).run() == {"work": "incomplete"}
+    # Nothing about the inputs changed, but the unfinished work still has to be retried.
+    assert Pipeline([make_stage(output, runs)], state).run() == {"work": "ran"}
+    assert Pipeline([make_stage(output, runs)], state).run() == {"work": "skipped"}
+    assert len(runs) == 2
+
+
+def test_incomplete_stage_forgets_earlier_fingerprint(tmp_path):
+    output, state = str(tmp_path / "out.json"), str(tmp_path / "state.json")
+    runs = []
+    Pipeline([make_stage(output, runs)], state).run(force=True)
+    Pipeline([make_stage(output, runs, unfinished="1 search term")], state).run(force=True)
+    assert Pipeline([make_stage(output, runs)], state).run() == {"work": "ran"}
+
+
+def test_stage_without_skip_unchanged_always_runs(tmp_path):
+    output, state = str(tmp_path / "out.json"), str(tmp_path / "state.json")
+    runs = []
+    for _ in range(2):
+        stage = make_stage(output, runs)
+        stage.skip_unchanged = False
+        assert Pipeline([stage], state).run() == {"work": "ran"}
+    assert len(runs) == 2
@@ -0,0 +1,51 @@
+from src import record_store
+from src.record_store import RecordStore
+
+
+def test_records_keep_their_order_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(record_store, "BLOCK_RECORDS", 3)
+    path = str(tmp_path / "places.sqlite")
+    with RecordStore(path, key="place_id") as store:
+        store.upsert_many({"place_id": f"p{i}", "n": i} for i in range(7))
+        store.upsert({"name": "No key"})
+        assert len(store) == 8
+
+    with RecordStore(path) as store:
+        assert store.key == "place_id"
+        assert [record.get("place_id") for record in store] == [f"p{i}" for i in range(7)] + [None]
+
+
+def test_upsert_updates_packed_and_unpacked_records_in_place(tmp_path, monkeypatch):
+    monkeypatch.setattr(record_store, "BLOCK_RECORDS", 3)
+    with RecordStore(str(tmp_path / "places.sqlite"), key="place_id") as store:
+        store.upsert_many({"place_id": f"p{i}", "n": i} for i in range(4))
+        store.upsert_many([{"place_id": "p1", "rating": 4}, {"place_id": "p3", "rating": 5}])
+
+        assert len(store) == 4
+        assert store.get("p1") == {"place_id": "p1", "n": 1, "rating": 4}
+        assert store.get("p3") == {"place_id": "p3", "n": 3, "rating": 5}
+        assert [record["place_id"] for record in store] == ["p0", "p1", "p2", "p3"]
+
+
+def test_lookups_normalize_the_key(tmp_path):
+    with RecordStore(str(tmp_path / "people.sqlite"), key="email") as store:
+        store.upsert({"email": "Jo@Acme.com", "name": "Jo"})
+        assert " jo@acme.COM" in store
+        assert store.get("jo@acme.com")["name"] == "Jo"
+        assert store.get("someone@else.com") is None
+
+
+def test_clear_removes_every_record(tmp_path, monkeypatch):
+    monkeypatch.setattr(record_store, "BLOCK_RECORDS", 2)
+    with RecordStore(str(tmp_path / "places.sqlite"), key="place_id") as store:
+        store.upsert_many({"place_id": f"p{i}"} for i in range(5))
+        store.clear()
+        assert len(store) == 0
+        assert "p1" not in store
+        assert list(store) == []
+
+
+def test_duplicates_within_one_write_are_merged(tmp_path):
+    with RecordStore(str(tmp_path / "places.sqlite"), key="place_id") as store:
+        store.upsert_many([{"place_id": "p1", "name": "Acme"}, {"place_id": "p1", "rating": 4}])
+        assert list(store) == [{"place_id": "p1", "name": "Acme", "rating": 4}]
@@ -0,0 +1,44 @@
+import json
+from src.checkpoint import read_records
+from src.record_store import RecordStore
+from src.sharding import Shard, reduce_outputs
+
+
+def write_ndjson(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def test_every_key_has_exactly_one_shard():
+    shards = [Shard(index, 4) for index in range(4)]
+    for term in ("tech companies in Pune", "acme.com", "place_123"):
+        assert sum(shard.owns(term) for shard in shards) == 1
+
+
+def test_reduce_merges_search_terms_across_shards(tmp_path):
+    first, second = str(tmp_path / "0.ndjson"), str(tmp_path / "1.ndjson")
+    write_ndjson(first, [{"place_id": "p1", "name": "Acme", "search_terms": ["a"]}])
+    write_ndjson(second, [
+        {"place_id": "p1", "name": "Acme Ltd", "search_terms": ["b", "a"]},
+        {"place_id": "p2", "name": "Globex", "search_terms": ["b"]},
+    ])
+
+    for output in (str(tmp_path / "out.ndjson"), str(tmp_path / "out.sqlite")):
+        assert reduce_outputs([first, second, str(tmp_path / "missing.ndjson")], output, "place_id") == 2
+        assert list(read_records(output)) == [
+            {"place_id": "p1", "name": "Acme", "search_terms": ["a", "b"]},
+            {"place_id": "p2", "name": "Globex", "search_terms": ["b"]},
+        ]
+
+    with RecordStore(str(tmp_path / "out.sqlite")) as store:
+        assert store.key == "place_id"
+
+
+def test_reduce_dedups_emails_case_insensitively(tmp_path):
+    first, second = str(tmp_path / "0.ndjson"), str(tmp_path / "1.ndjson")
+    write_ndjson(first, [{"email": "Jo@acme.com", "name": "Jo"}])
+    write_ndjson(second, [{"email": "jo@acme.com ", "name": "Jo B"}, {"email": "al@acme.com"}])
+    output = str(tmp_path / "out.ndjson")
+    assert reduce_outputs([first, second], output, "email") == 2
+    assert [record["email"] for record in read_records(output)] == ["Jo@acme.com", "al@acme.com"]